@@ -3,14 +3,18 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
-For more information on this file, see
-https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+Sync views are served from a thread pool of ASGI_THREADS threads per worker,
+see core.asgi.ThreadPoolASGIHandler.
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from core.asgi import ThreadPoolASGIHandler  # noqa: E402
+
+application = ThreadPoolASGIHandler()
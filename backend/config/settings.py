@@ -46,6 +46,31 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Профилирование запросов: заголовок Server-Timing для запросов
+# с X-Profile или от сотрудников, буфер последних профилей в админке.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', str(DEBUG)) == 'True'
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_LOG = os.getenv('PROFILING_LOG', 'False') == 'True'
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', 200))
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, 'core.middleware.ProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -66,7 +91,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-if os.getenv('USE_SQLITE', 'False') == 'True':
+USE_SQLITE = os.getenv('USE_SQLITE', 'False') == 'True'
+
+if USE_SQLITE:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
@@ -85,8 +112,115 @@ else:
         }
     }
 
+# Реплики для чтения: хосты PostgreSQL (host или host:port), а при
+# USE_SQLITE - пути к файлам, через запятую. GET-запросы рецептов,
+# тегов, ингредиентов и пользователей читают со случайной реплики;
+# пользователь после изменения REPLICA_PIN_SECONDS читает основную БД.
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.getenv(
+        'DB_REPLICAS', '').replace(' ', '').split(','))):
+    alias = f'replica_{index}'
+    if USE_SQLITE:
+        location = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        **location,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+# Версии данных для ETag и индекс автодополнения хранят общее состояние
+# в кэше: при нескольких процессах нужен разделяемый бэкенд,
+# например django_redis.cache.RedisCache (сервис redis в infra).
+# gunicorn.conf.py не запускает несколько воркеров с кэшем в памяти.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+}
+
+# Срок жизни версий данных, созданных при чтении, секунды. Версии,
+# измененные записью, хранятся без срока.
+VERSION_CACHE_TTL = int(os.getenv('VERSION_CACHE_TTL', 86400))
+
 JSON_FILES_DIR = os.path.join(BASE_DIR, 'data')
 
+INGREDIENT_AUTOCOMPLETE_BACKEND = os.getenv(
+    'INGREDIENT_AUTOCOMPLETE_BACKEND', 'memory'
+)
+
+# Кэш аутентификации по токену: размер LRU процесса и срок жизни записей.
+# Версии токенов хранятся в кэше default; с кэшем в памяти процесса
+# выход или смена пароля не видны другим воркерам, поэтому кэш токенов
+# работает только с общим бэкендом.
+TOKEN_CACHE_ENABLED = (
+    CACHES['default']['BACKEND']
+    != 'django.core.cache.backends.locmem.LocMemCache'
+)
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+# Статистика попаданий считается по выборке: учитывается в среднем один
+# запрос из TOKEN_CACHE_STATS_SAMPLE; 0 - не считать.
+TOKEN_CACHE_STATS_SAMPLE = int(os.getenv('TOKEN_CACHE_STATS_SAMPLE', 100))
+
+# Кэш множеств избранного, корзины и подписок пользователя, секунды;
+# 0 - загружать множества из БД в каждом запросе.
+MEMBERSHIP_CACHE_TTL = int(os.getenv('MEMBERSHIP_CACHE_TTL', 300))
+
+# Отложенная запись избранного, корзины и подписок: изменения копятся
+# в журнале SQLite на диске хоста и применяются фоновым потоком пачками.
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'False') == 'True'
+WRITE_BEHIND_LOG_PATH = os.getenv(
+    'WRITE_BEHIND_LOG_PATH', str(BASE_DIR / 'write_behind.sqlite3')
+)
+WRITE_BEHIND_FLUSH_INTERVAL = float(
+    os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 1)
+)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 500))
+
+# Число потоков для синхронных представлений в одном ASGI-воркере.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+
+# Миниатюры и WebP-варианты изображений строятся в фоновых потоках.
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
+# Короткие ссылки: LRU кодов в процессе, срок кэширования редиректа
+# клиентами и прокси, период сброса накопленных переходов в БД.
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 3600))
+SHORT_LINK_MAX_AGE = int(os.getenv('SHORT_LINK_MAX_AGE', 86400))
+SHORT_LINK_FLUSH_INTERVAL = float(
+    os.getenv('SHORT_LINK_FLUSH_INTERVAL', 10)
+)
+SHORT_LINK_FLUSH_THRESHOLD = int(
+    os.getenv('SHORT_LINK_FLUSH_THRESHOLD', 1000)
+)
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -126,7 +260,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'core.pagination.LimitPageNumberPagination',
     'PAGE_SIZE': 10,
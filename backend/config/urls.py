@@ -1,13 +1,16 @@
 # foodgram/urls.py
 
+from core.views import profiling_view
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from recipes.views import short_link_view
+from recipes.views import legacy_short_link_view, short_link_view
 
 urlpatterns = [
-    path('s/<int:pk>/', short_link_view, name='short-link'),
+    path('s/<int:pk>/', legacy_short_link_view, name='legacy-short-link'),
+    path('s/<str:code>/', short_link_view, name='short-link'),
+    path('admin/profiling/', profiling_view, name='profiling'),
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls')),
     path('api/', include('users.urls')),
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signals
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.base import BaseHandler
+
+STREAM_END = object()
+# Сколько частей потокового ответа может ждать отправки клиенту.
+STREAM_QUEUE_SIZE = 8
+
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """
+    ASGI-обработчик, который выполняет синхронные представления
+    в пуле из ASGI_THREADS потоков.
+
+    В Django 3.2 нет асинхронного ORM, а стандартный ASGIHandler
+    запускает все синхронные представления в одном потоке. Здесь
+    соединения и медленные клиенты обслуживает цикл событий uvicorn,
+    а медленный запрос к БД занимает один поток пула, а не весь воркер.
+    """
+
+    def __init__(self):
+        BaseHandler.__init__(self)
+        self.load_middleware()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi'
+        )
+
+    async def run_in_pool(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    def get_response_in_pool(self, request):
+        # Соединения с БД принадлежат потоку, поэтому старые соединения
+        # закрываются в том же потоке, где выполняется запрос.
+        signals.request_started.send(
+            sender=self.__class__, scope=request.scope
+        )
+        return self.get_response(request)
+
+    async def get_response_async(self, request):
+        return await self.run_in_pool(self.get_response_in_pool, request)
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        # Потоковый ответ (например, список покупок) читает БД по мере
+        # отправки, поэтому части собираются в потоке пула.
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (header.encode('ascii'), value.encode('latin1'))
+                for header, value in response.items()
+            ] + [
+                (b'Set-Cookie', cookie.output(header='').encode('ascii')
+                 .strip())
+                for cookie in response.cookies.values()
+            ],
+        })
+        # Курсор БД нельзя передавать между потоками, поэтому ответ
+        # читается целиком в одном потоке общего пула, а части
+        # передаются в цикл событий через ограниченную очередь.
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        cancelled = threading.Event()
+        producer = asyncio.ensure_future(self.run_in_pool(
+            self.read_stream, response, loop, queue, cancelled
+        ))
+        part = None
+        try:
+            while True:
+                part = await queue.get()
+                if part is STREAM_END:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            # Если клиент отключился, поток пула останавливается и
+            # освобождает место в очереди.
+            cancelled.set()
+            while part is not STREAM_END:
+                part = await queue.get()
+            await producer
+
+    @staticmethod
+    def read_stream(response, loop, queue, cancelled):
+        """Читает потоковый ответ в потоке пула и закрывает его там же."""
+        def put(part):
+            asyncio.run_coroutine_threadsafe(queue.put(part), loop).result()
+
+        try:
+            for part in response:
+                if cancelled.is_set():
+                    break
+                put(part)
+        finally:
+            try:
+                response.close()
+            finally:
+                put(STREAM_END)
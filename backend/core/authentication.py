@@ -0,0 +1,147 @@
+"""Аутентификация по токену с кэшем пользователей."""
+
+import hashlib
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.db.models import DEFERRED, FileField
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .conditional import auth_version_key, bump_versions, get_versions
+from .lru import LRUCache
+
+TOKEN_CACHE_PREFIX = 'auth_token:'
+LOCAL_HITS_KEY = 'auth_cache:local_hits'
+SHARED_HITS_KEY = 'auth_cache:shared_hits'
+MISSES_KEY = 'auth_cache:misses'
+STATS_KEYS = (LOCAL_HITS_KEY, SHARED_HITS_KEY, MISSES_KEY)
+# Хэш пароля не попадает в кэш, а счетчики меняются сигналами через F()
+# и в кэше устаревают. Эти поля отложены и читаются из БД при обращении.
+UNCACHED_USER_FIELDS = frozenset(
+    ('password', 'recipes_count', 'subscribers_count')
+)
+
+User = get_user_model()
+
+
+local_tokens = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+def _record(key):
+    """
+    Учитывает запрос в статистике по выборке: запись в общий кэш на
+    каждый запрос стоила бы больше, чем экономит кэш токенов.
+    """
+    sample = settings.TOKEN_CACHE_STATS_SAMPLE
+    if not sample or random.randrange(sample):
+        return
+    try:
+        cache.incr(key, sample)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, sample)
+
+
+def get_stats():
+    """Возвращает попадания в локальный и общий кэш и промахи."""
+    stats = cache.get_many(STATS_KEYS)
+    return tuple(stats.get(key, 0) for key in STATS_KEYS)
+
+
+def reset_stats():
+    cache.delete_many(STATS_KEYS)
+
+
+def dump_instance(instance, exclude=frozenset()):
+    """Значения загруженных полей объекта для сохранения в кэше."""
+    fields, values = [], []
+    for field in instance._meta.concrete_fields:
+        if field.attname in exclude:
+            continue
+        value = getattr(instance, field.attname)
+        if isinstance(field, FileField):
+            # FieldFile ссылается на объект целиком, хранится только имя.
+            value = value.name
+        fields.append(field.attname)
+        values.append(value)
+    return tuple(fields), tuple(values)
+
+
+def load_instance(model, entry):
+    """
+    Новый объект модели из значений dump_instance.
+
+    Остальные поля отложены: полное сохранение такого объекта
+    записывает только загруженные поля, и устаревшие значения
+    из кэша не затирают изменения, сделанные другими запросами.
+    """
+    fields, values = entry
+    values = iter(values)
+    return model.from_db(router.db_for_write(model), fields, [
+        next(values) if field.attname in fields else DEFERRED
+        for field in model._meta.concrete_fields
+    ])
+
+
+def get_token_hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(keys):
+    """Делает недействительными кэшированные записи токенов."""
+    bump_versions(*(auth_version_key(get_token_hash(key)) for key in keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который не обращается к БД при повторных
+    запросах с тем же токеном.
+
+    В LRU процесса и в общем кэше хранятся значения полей пользователя
+    и токена вместе с версией токена, и на каждый запрос из них строятся
+    новые объекты. Запись действует, пока версия не изменилась: ее
+    меняют удаление токена (выход) и сохранение пользователя (смена
+    пароля, is_active, профиля), а также истечение TOKEN_CACHE_TTL.
+    Без общего кэша (TOKEN_CACHE_ENABLED) токен проверяется по БД.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_ENABLED:
+            return super().authenticate_credentials(key)
+        token_hash = get_token_hash(key)
+        cache_key = TOKEN_CACHE_PREFIX + token_hash
+        # Версия читается до запроса к БД, поэтому изменение во время
+        # запроса сделает сохраненную запись недействительной.
+        version = get_versions((auth_version_key(token_hash),))[0][0]
+
+        entry = local_tokens.get(cache_key)
+        if entry is not None and entry[2] == version:
+            _record(LOCAL_HITS_KEY)
+            return self.load_entry(entry)
+
+        entry = cache.get(cache_key)
+        if entry is not None and entry[2] == version:
+            _record(SHARED_HITS_KEY)
+            local_tokens.set(cache_key, entry)
+            return self.load_entry(entry)
+
+        _record(MISSES_KEY)
+        user, token = super().authenticate_credentials(key)
+        entry = (
+            dump_instance(user, UNCACHED_USER_FIELDS),
+            dump_instance(token),
+            version
+        )
+        cache.set(cache_key, entry, settings.TOKEN_CACHE_TTL)
+        local_tokens.set(cache_key, entry)
+        return user, token
+
+    def load_entry(self, entry):
+        user = load_instance(User, entry[0])
+        token = load_instance(Token, entry[1])
+        token.user = user
+        return user, token
@@ -0,0 +1,124 @@
+"""Условные GET-запросы на основе версий данных в кэше."""
+
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .db_router import replica_may_lag
+
+VERSION_CACHE_PREFIX = 'version:'
+TAGS_VERSION_KEY = 'tags'
+INGREDIENTS_VERSION_KEY = 'ingredients'
+RECIPES_VERSION_KEY = 'recipes'
+# Состав ленты и теги рецептов: меняется при создании и удалении
+# рецептов и при изменении их тегов, но не при правке текста или фото.
+RECIPE_TAGS_VERSION_KEY = 'recipe_tags'
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def membership_version_key(user_id):
+    """Версия избранного, корзины и подписок пользователя."""
+    return f'membership:{user_id}'
+
+
+def auth_version_key(token_hash):
+    """Версия токена и его пользователя в кэше аутентификации."""
+    return f'auth:{token_hash}'
+
+
+def _new_version():
+    return uuid.uuid4().hex, int(time.time())
+
+
+def bump_versions(*keys):
+    """
+    Меняет версии данных, делая недействительными выданные ETag.
+
+    Новая версия публикуется после фиксации транзакции, иначе
+    параллельный запрос мог бы связать ее со старыми данными.
+    """
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(
+            {VERSION_CACHE_PREFIX + key: _new_version() for key in keys},
+            None
+        ))
+
+
+def get_versions(keys):
+    """
+    Возвращает пары (токен, время изменения) для ключей версий.
+
+    Отсутствующие версии создаются со сроком VERSION_CACHE_TTL: ключи
+    строятся в том числе по id из URL, и запросы к несуществующим
+    объектам иначе навсегда занимали бы место в кэше. Истекшая версия
+    создается заново и только делает недействительными выданные ETag.
+    """
+    cache_keys = [VERSION_CACHE_PREFIX + key for key in keys]
+    versions = cache.get_many(cache_keys)
+    missing = {
+        cache_key: _new_version()
+        for cache_key in cache_keys if cache_key not in versions
+    }
+    if missing:
+        cache.set_many(missing, settings.VERSION_CACHE_TTL)
+        versions.update(missing)
+    return [versions[cache_key] for cache_key in cache_keys]
+
+
+def conditional(get_version_keys):
+    """
+    Декоратор представления, отвечающий 304 до вызова сериализатора.
+
+    get_version_keys получает те же аргументы, что и представление,
+    и возвращает ключи версий, от которых зависит ответ. ETag
+    вычисляется по токенам этих версий, Last-Modified - по самому
+    позднему изменению. Если реплика может еще не иметь последнего
+    изменения, ответ отдается без них: иначе клиент получал бы 304
+    на устаревшие данные.
+
+    Cache-Control: no-cache не дает браузеру считать ответ свежим по
+    Last-Modified без проверки, а ответы пользователю с is_favorited
+    и подобными полями еще и private.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(request, *args, **kwargs):
+            versions = get_versions(
+                get_version_keys(request, *args, **kwargs)
+            )
+            etag = quote_etag(hashlib.sha1(
+                '|'.join(token for token, _ in versions).encode()
+            ).hexdigest())
+            last_modified = max(timestamp for _, timestamp in versions)
+            replica_lags = replica_may_lag(last_modified)
+
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=last_modified,
+            )
+            if response is None:
+                response = func(request, *args, **kwargs)
+            if response.status_code == 200 and not replica_lags:
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(last_modified))
+            patch_vary_headers(response, ('Authorization',))
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+
+        return inner
+    return decorator
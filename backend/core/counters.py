@@ -0,0 +1,32 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(queryset, field, delta):
+    """
+    Атомарно изменяет денормализованный счетчик через F().
+
+    Значение не опускается ниже нуля, даже если счетчик разошелся
+    с данными; расхождения исправляет команда recount_counters.
+    """
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def recount_counter(model, field, related_model, related_field):
+    """
+    Пересчитывает счетчик model.field по строкам related_model.
+
+    Обновляются только разошедшиеся строки; возвращает их количество.
+    Функция принимает модели явно, поэтому подходит и для миграций.
+    """
+    actual = Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+    drifted = model.objects.annotate(actual=actual).exclude(
+        **{field: F('actual')}
+    ).values('pk')
+    return model.objects.filter(pk__in=drifted).update(**{field: actual})
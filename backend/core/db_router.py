@@ -0,0 +1,121 @@
+"""
+Чтение с реплик БД для безопасных запросов API.
+
+Представления с ReplicaReadMixin на время GET-запроса разрешают
+чтение с реплики; остальной код, фоновые потоки и команды читают
+основную БД. Пользователь после изменения закрепляется за основной БД
+на REPLICA_PIN_SECONDS, чтобы отставание реплики не показало ему
+старые данные. По той же причине собственные данные пользователя
+(множества recipes.membership) с версией моложе этого окна читаются
+из основной БД. Общие данные с такой версией читаются с реплики, но
+ответ не попадает в кэш и не получает ETag под новой версией, а
+индексы в памяти процесса всегда строятся по основной БД.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_CACHE_PREFIX = 'primary_pin:'
+
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """Чтение - с реплики, если ее выбрал запрос; запись - в основную БД."""
+
+    def db_for_read(self, model, **hints):
+        alias = read_database.get()
+        # Внутри транзакции чтение должно видеть ее же изменения.
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_to_primary(user_id):
+    """Закрепляет пользователя за основной БД после изменения."""
+    cache.set(f'{PIN_CACHE_PREFIX}{user_id}', 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(f'{PIN_CACHE_PREFIX}{user_id}') is not None
+
+
+def replica_may_lag(timestamp):
+    """
+    Читает ли запрос реплику, которая может еще не иметь изменений,
+    сделанных в момент timestamp.
+    """
+    # Время версий округлено вниз до секунды.
+    return (read_database.get() is not None
+            and time.time() - timestamp < settings.REPLICA_PIN_SECONDS + 1)
+
+
+def use_primary_if_changed_since(timestamp):
+    """
+    Переключает текущий запрос на основную БД, если данные изменились
+    позже, чем реплика гарантированно их получила. Применяется
+    к собственным данным пользователя.
+    """
+    if replica_may_lag(timestamp):
+        read_database.set(None)
+
+
+@contextmanager
+def primary_reads():
+    """Чтение основной БД внутри блока, например для общих индексов."""
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+class ReplicaReadMixin:
+    """
+    Примесь ViewSet: безопасные запросы читают с реплики.
+
+    Аутентификация и проверка прав выполняются до выбора реплики, по
+    основной БД. Действия из primary_actions всегда читают основную БД,
+    например GET, который создает объекты.
+    """
+
+    primary_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.REPLICA_DATABASES
+                and request.method in SAFE_METHODS
+                and self.action not in self.primary_actions
+                and not (request.user.is_authenticated
+                         and is_pinned_to_primary(request.user.pk))):
+            self._read_database_token = read_database.set(
+                random.choice(settings.REPLICA_DATABASES)
+            )
+
+    def dispatch(self, request, *args, **kwargs):
+        self._read_database_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._read_database_token is not None:
+                read_database.reset(self._read_database_token)
+            if (settings.REPLICA_DATABASES
+                    and request.method not in SAFE_METHODS
+                    and self.request.user.is_authenticated):
+                pin_to_primary(self.request.user.pk)
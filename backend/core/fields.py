@@ -0,0 +1,45 @@
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from .images import get_image_url, strip_metadata
+
+
+class StrippedBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField, который сохраняет изображение без метаданных:
+    исходный файл отдается клиентам, и координаты съемки из EXIF
+    не должны в него попасть.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        if file is None:
+            return file
+        return strip_metadata(file)
+
+
+class ImageVariantField(serializers.Field):
+    """
+    URL уменьшенного варианта изображения.
+
+    variant используется по умолчанию, list_variant - в действии list.
+    Без варианта или пока он не готов отдается исходный файл.
+    """
+
+    def __init__(self, variant=None, list_variant=None, **kwargs):
+        self.variant = variant
+        self.list_variant = list_variant
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        variant = self.variant
+        view = self.context.get('view')
+        if self.list_variant and getattr(view, 'action', None) == 'list':
+            variant = self.list_variant
+        url = get_image_url(instance, self.field_name, variant)
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
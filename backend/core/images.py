@@ -0,0 +1,196 @@
+"""Фоновая обработка загруженных изображений: миниатюры и WebP/AVIF."""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('foodgram.images')
+
+SOURCE_KEY = 'source'
+VARIANTS_DIR = 'variants'
+IMAGE_VARIANTS = {
+    'thumb': (320, 320),
+    'medium': (960, 960),
+}
+# Порядок важен: сериализаторы отдают первый из доступных форматов.
+VARIANT_FORMATS = (
+    ('webp', 'WEBP'),
+    ('avif', 'AVIF'),
+)
+VARIANT_QUALITY = 80
+ORIGINAL_QUALITY = 95
+# Ключи Image.info с метаданными, которые не должны попасть в отдаваемые
+# файлы: EXIF с координатами съемки, цветовой профиль, XMP и комментарии.
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp',
+                 'photoshop', 'comment')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PROCESSING_WORKERS,
+    thread_name_prefix='images'
+)
+
+
+def get_variant_formats():
+    """Форматы вариантов, которые поддерживает установленный Pillow."""
+    Image.init()
+    return [
+        (extension, image_format)
+        for extension, image_format in VARIANT_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def get_variant_name(source, variant, extension):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, VARIANTS_DIR, f'{stem}_{variant}.{extension}'
+    )
+
+
+def open_image(source):
+    with default_storage.open(source) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if image.mode in ('LA', 'P') else 'RGB'
+        )
+    # Метаданные (EXIF, ICC, XMP) в варианты не переносятся.
+    image.info = {}
+    return image
+
+
+def has_metadata(image):
+    return bool(
+        any(key in image.info for key in METADATA_KEYS) or image.getexif()
+    )
+
+
+def strip_metadata(file):
+    """
+    Возвращает файл изображения без метаданных, с учетом поворота из EXIF.
+
+    Файл без метаданных и анимация возвращаются как есть: перекодирование
+    нужно только тем загрузкам, в которых метаданные действительно есть.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        if getattr(image, 'is_animated', False) or not has_metadata(image):
+            file.seek(0)
+            return file
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.info = {}
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.save(buffer, image_format, quality=ORIGINAL_QUALITY)
+        else:
+            image.save(buffer, image_format)
+    return ContentFile(buffer.getvalue(), name=file.name)
+
+
+def strip_stored_metadata(name):
+    """
+    Перезаписывает файл хранилища без метаданных и возвращает его имя;
+    имя может измениться, если хранилище не отдаст прежнее.
+    """
+    with default_storage.open(name) as file:
+        original = ContentFile(file.read(), name=name)
+    stripped = strip_metadata(original)
+    if stripped is original:
+        return name
+    default_storage.delete(name)
+    return default_storage.save(name, stripped)
+
+
+def build_variants(source):
+    """
+    Сохраняет уменьшенные копии изображения и возвращает словарь
+    {variant: {extension: имя файла в хранилище}}.
+    """
+    image = open_image(source)
+    variants = {SOURCE_KEY: source}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {}
+        for extension, image_format in get_variant_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, quality=VARIANT_QUALITY)
+            name = get_variant_name(source, variant, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[variant][extension] = default_storage.save(
+                name, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def process_image(model, pk, field_name, variants_field, on_done=None):
+    """Строит варианты изображения объекта и сохраняет их имена."""
+    try:
+        source = model.objects.filter(pk=pk).values_list(
+            field_name, flat=True
+        ).first()
+        if not source:
+            return
+        variants = build_variants(source)
+        # Пока шла обработка, изображение могли заменить.
+        updated = model.objects.filter(
+            pk=pk, **{field_name: source}
+        ).update(**{variants_field: variants})
+        if updated and on_done is not None:
+            on_done(pk)
+    except FileNotFoundError:
+        logger.warning(
+            'Нет файла изображения %s #%s: %s', model.__name__, pk, source
+        )
+    except Exception:
+        logger.exception(
+            'Не удалось обработать изображение %s #%s',
+            model.__name__, pk
+        )
+    finally:
+        connection.close()
+
+
+def schedule_image_processing(instance, field_name, on_done=None):
+    """
+    Ставит обработку изображения в очередь после фиксации транзакции,
+    если для текущего файла еще нет вариантов.
+    """
+    variants_field = f'{field_name}_variants'
+    source = getattr(instance, field_name).name
+    variants = getattr(instance, variants_field) or {}
+    if not source or variants.get(SOURCE_KEY) == source:
+        return
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: executor.submit(
+        process_image, model, pk, field_name, variants_field, on_done
+    ))
+
+
+def get_image_url(instance, field_name, variant=None):
+    """
+    URL варианта изображения; пока варианты не готовы или variant
+    не задан - URL исходного файла.
+    """
+    image = getattr(instance, field_name)
+    if not image:
+        return None
+    variants = getattr(instance, f'{field_name}_variants', None) or {}
+    if variant and variants.get(SOURCE_KEY) == image.name:
+        for extension, _ in VARIANT_FORMATS:
+            name = variants.get(variant, {}).get(extension)
+            if name:
+                return default_storage.url(name)
+    return image.url
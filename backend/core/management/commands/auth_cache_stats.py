@@ -0,0 +1,34 @@
+from core.authentication import get_stats, reset_stats
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кэша аутентификации по токену. '
+        'Счетчики оценочные: запросы учитываются по выборке '
+        'TOKEN_CACHE_STATS_SAMPLE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счетчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.TOKEN_CACHE_ENABLED:
+            self.stdout.write(
+                'Кэш токенов выключен: CACHE_BACKEND не задает общий кэш.'
+            )
+        local_hits, shared_hits, misses = get_stats()
+        total = local_hits + shared_hits + misses
+        ratio = (local_hits + shared_hits) / total if total else 0
+        self.stdout.write(
+            f'Попаданий в память процесса: {local_hits}, '
+            f'в общий кэш: {shared_hits}, промахов: {misses}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
+        if options['reset']:
+            reset_stats()
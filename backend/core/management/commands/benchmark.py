@@ -0,0 +1,313 @@
+import json
+import random
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+PAGE_LIMIT = 6
+RECIPES_LIMIT = 3
+AUTOCOMPLETE_PREFIX_LENGTH = 3
+# Показатели, которые сравниваются с базовым прогоном.
+COMPARED_METRICS = ('p50', 'p95', 'queries', 'writes')
+# Показатели, рост которых недопустим независимо от tolerance.
+EXACT_METRICS = ('queries', 'writes')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку (метод ближайшего ранга)."""
+    index = max(0, int(round(fraction * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные эндпоинты через тестовый клиент Django '
+        'и выводит p50/p95, число запросов к БД и пропускную способность. '
+        'Результат можно сохранить как базовый и сравнивать с ним '
+        'следующие прогоны. Для конкурентной нагрузки на запущенный '
+        'сервер используйте load_test.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на каждый сценарий.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Запросов на прогрев перед замерами.'
+        )
+        parser.add_argument(
+            '--scenario', action='append', default=[],
+            help='Запустить только указанные сценарии.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя для авторизованных запросов; по '
+                 'умолчанию берется пользователь с самой большой корзиной.'
+        )
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument(
+            '--save-baseline', metavar='PATH',
+            help='Сохранить результаты в JSON как базовые.'
+        )
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help='Сравнить результаты с сохраненными базовыми.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост показателей относительно базовых, доля.'
+        )
+
+    def _get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'Пользователь {email} не найден.')
+            return user
+        user = User.objects.annotate(
+            cart_size=Count('shopping_carts')
+        ).order_by('-cart_size', 'pk').first()
+        if user is None:
+            raise CommandError(
+                'В базе нет пользователей, запустите generate_data.'
+            )
+        return user
+
+    def _get_update_scenarios(self, user):
+        """
+        PATCH рецепта пользователя: правка текста и количества одного
+        ингредиента. Показывают, сколько записей в БД стоит правка.
+        """
+        recipe = Recipe.objects.filter(author=user).order_by('pk').first()
+        if recipe is None:
+            return {}
+        path = f'/api/recipes/{recipe.pk}/'
+
+        def ingredients():
+            links = list(RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).order_by('pk').values('ingredient_id', 'amount'))
+            # Количество первого ингредиента чередуется между запросами.
+            links[0]['amount'] += 1 if links[0]['amount'] % 2 else -1
+            return {'ingredients': [
+                {'id': link['ingredient_id'], 'amount': link['amount']}
+                for link in links
+            ]}
+
+        return {
+            'recipe_update_text': (
+                True, lambda: path, lambda: {'text': recipe.text}
+            ),
+            'recipe_update_ingredients': (True, lambda: path, ingredients),
+        }
+
+    def _get_scenarios(self, rng, user):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        author_ids = list(
+            Recipe.objects.values_list('author_id', flat=True).distinct()
+        )
+        slugs = list(Tag.objects.values_list('slug', flat=True))
+        prefixes = sorted({
+            name[:AUTOCOMPLETE_PREFIX_LENGTH]
+            for name in Ingredient.objects.values_list('name', flat=True)
+        })
+        if not recipe_ids or not slugs or not prefixes:
+            raise CommandError(
+                'Недостаточно данных для замеров, запустите generate_data.'
+            )
+
+        def tag_filter():
+            return '&'.join(
+                f'tags={slug}'
+                for slug in rng.sample(slugs, rng.randint(1, len(slugs)))
+            )
+
+        return {
+            'recipes_list_anonymous': (
+                False, lambda: f'/api/recipes/?limit={PAGE_LIMIT}'
+            ),
+            'recipes_list': (
+                True, lambda: f'/api/recipes/?limit={PAGE_LIMIT}'
+            ),
+            'recipes_list_tags': (
+                True,
+                lambda: f'/api/recipes/?limit={PAGE_LIMIT}&{tag_filter()}'
+            ),
+            'recipes_list_author': (
+                True,
+                lambda: f'/api/recipes/?limit={PAGE_LIMIT}'
+                        f'&author={rng.choice(author_ids)}'
+            ),
+            'recipes_list_favorited': (
+                True,
+                lambda: f'/api/recipes/?limit={PAGE_LIMIT}&is_favorited=1'
+            ),
+            'recipe_detail': (
+                True, lambda: f'/api/recipes/{rng.choice(recipe_ids)}/'
+            ),
+            'subscriptions': (
+                True,
+                lambda: f'/api/users/subscriptions/?limit={PAGE_LIMIT}'
+                        f'&recipes_limit={RECIPES_LIMIT}'
+            ),
+            'download_shopping_cart': (
+                True, lambda: '/api/recipes/download_shopping_cart/'
+            ),
+            'ingredient_autocomplete': (
+                False,
+                lambda: f'/api/ingredients/?name={rng.choice(prefixes)}'
+            ),
+            **self._get_update_scenarios(user),
+        }
+
+    def _run(self, client, get_path, count, get_data=None):
+        timings, queries, writes, errors = [], [], [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            path = get_path()
+            data = get_data() if get_data else None
+            with ExitStack() as stack:
+                # Запросы к репликам тоже учитываются.
+                contexts = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias])
+                    )
+                    for alias in connections
+                ]
+                request_started = time.perf_counter()
+                if data is None:
+                    response = client.get(path)
+                else:
+                    response = client.patch(
+                        path, json.dumps(data),
+                        content_type='application/json'
+                    )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append(
+                    (time.perf_counter() - request_started) * 1000
+                )
+            captured = [
+                query for context in contexts
+                for query in context.captured_queries
+            ]
+            queries.append(len(captured))
+            writes.append(sum(
+                query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)
+                for query in captured
+            ))
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'p50': round(percentile(timings, 0.5), 2),
+            'p95': round(percentile(timings, 0.95), 2),
+            'mean': round(statistics.mean(timings), 2),
+            'queries': round(statistics.mean(queries), 2),
+            'max_queries': max(queries),
+            'writes': round(statistics.mean(writes), 2),
+            'rps': round(count / elapsed, 1),
+            'errors': errors,
+        }
+
+    def _compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            changes = []
+            for metric in COMPARED_METRICS:
+                # В старых базовых результатах может не быть показателя.
+                if metric not in base:
+                    continue
+                before, after = base[metric], result[metric]
+                change = (after - before) / before if before else 0
+                changes.append(f'{metric} {change:+.0%}')
+                # Число запросов и записей должно оставаться прежним,
+                # время может колебаться в пределах tolerance.
+                limit = 0 if metric in EXACT_METRICS else tolerance
+                if after > before * (1 + limit) and after - before > 0.01:
+                    regressions.append(f'{name}: {metric} {before} -> {after}')
+            self.stdout.write(f'{name:26} ' + ', '.join(changes))
+        return regressions
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['random_seed'])
+        user = self._get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+        clients = {
+            False: Client(HTTP_HOST=host),
+            True: Client(
+                HTTP_HOST=host, HTTP_AUTHORIZATION=f'Token {token.key}'
+            ),
+        }
+        scenarios = self._get_scenarios(rng, user)
+        unknown = set(options['scenario']) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}. '
+                f'Доступны: {", ".join(scenarios)}'
+            )
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, пользователь: {user.email}'
+        )
+        self.stdout.write(
+            f'{"сценарий":26} {"p50, мс":>8} {"p95, мс":>8} '
+            f'{"запросы":>8} {"записи":>7} {"rps":>7} {"ошибки":>7}'
+        )
+        results = {}
+        for name, (authenticated, get_path, *get_data) in scenarios.items():
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            client = clients[authenticated]
+            self._run(client, get_path, options['warmup'], *get_data)
+            result = results[name] = self._run(
+                client, get_path, options['requests'], *get_data
+            )
+            self.stdout.write(
+                f'{name:26} {result["p50"]:8.2f} {result["p95"]:8.2f} '
+                f'{result["queries"]:8.1f} {result["writes"]:7.1f} '
+                f'{result["rps"]:7.1f} {result["errors"]:7}'
+            )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(
+                f'Базовые результаты сохранены в {options["save_baseline"]}'
+            )
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            self.stdout.write('Сравнение с базовыми результатами:')
+            regressions = self._compare(
+                results, baseline, options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write('Регрессий нет.')
+        if any(result['errors'] for result in results.values()):
+            raise CommandError('Часть запросов завершилась ошибкой.')
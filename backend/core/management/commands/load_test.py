@@ -0,0 +1,111 @@
+import http.client
+import os
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+def get_rss_kb(pid):
+    """Суммарная резидентная память процесса и его потомков, КБ."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as file:
+                    pending.extend(int(child) for child in file.read().split())
+        except OSError:
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: несколько клиентов '
+        'с keep-alive отправляют GET-запросы в течение заданного времени.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Адреса для запросов.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--pid', type=int,
+            help='PID мастер-процесса сервера для замера памяти.'
+        )
+        parser.add_argument(
+            '--header', action='append', default=[],
+            help='Заголовок запроса, например "Authorization: Token ...".'
+        )
+
+    def _client(self, urls, headers, deadline, timings, errors):
+        connections = {}
+        index = 0
+        while time.monotonic() < deadline:
+            url = urlsplit(urls[index % len(urls)])
+            index += 1
+            if url.netloc not in connections:
+                connections[url.netloc] = http.client.HTTPConnection(
+                    url.netloc, timeout=30
+                )
+            connection = connections[url.netloc]
+            path = url.path + (f'?{url.query}' if url.query else '')
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as error:
+                errors.append(error)
+                connection.close()
+                del connections[url.netloc]
+                continue
+            timings.append((time.perf_counter() - started) * 1000)
+
+    def handle(self, *args, **options):
+        headers = dict(
+            (part.strip() for part in header.split(':', 1))
+            for header in options['header']
+        )
+        timings, errors = [], []
+        deadline = time.monotonic() + options['duration']
+        rss_samples = []
+        clients = [
+            threading.Thread(
+                target=self._client,
+                args=(options['urls'], headers, deadline, timings, errors)
+            ) for _ in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for client in clients:
+            client.start()
+        while any(client.is_alive() for client in clients):
+            if options['pid']:
+                rss_samples.append(get_rss_kb(options['pid']))
+            time.sleep(0.5)
+        elapsed = time.monotonic() - started
+        if not timings:
+            self.stderr.write(f'Нет успешных ответов, ошибок: {len(errors)}')
+            return
+        timings.sort()
+        self.stdout.write(
+            f'Запросов: {len(timings)}, ошибок: {len(errors)}, '
+            f'{len(timings) / elapsed:.1f} запр/с\n'
+            f'Задержка: среднее {statistics.mean(timings):.1f} мс, '
+            f'p50 {timings[len(timings) // 2]:.1f} мс, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f} мс'
+        )
+        if rss_samples:
+            self.stdout.write(
+                f'Память сервера: до {max(rss_samples) / 1024:.1f} МБ'
+            )
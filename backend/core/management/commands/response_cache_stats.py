@@ -0,0 +1,24 @@
+from core.response_cache import get_stats, reset_stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает число попаданий и промахов кэша ответов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счетчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        hits, misses = get_stats()
+        total = hits + misses
+        ratio = hits / total if total else 0
+        self.stdout.write(
+            f'Попаданий: {hits}, промахов: {misses}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
+        if options['reset']:
+            reset_stats()
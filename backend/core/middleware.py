@@ -0,0 +1,93 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .profiling import (RequestProfile, current_profile, fingerprint_hash,
+                        profile_buffer)
+
+logger = logging.getLogger('foodgram.profiling')
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class ProfilingMiddleware:
+    """
+    Замеряет число и время SQL-запросов ко всем БД, включая реплики,
+    повторяющиеся запросы и время сериализации.
+
+    Результат отдается в заголовке Server-Timing, если запрос пришел
+    с заголовком X-Profile (значение PROFILING_TOKEN, а при DEBUG
+    и пустом токене - любое) или от сотрудника. Такие запросы также
+    попадают в буфер, доступный в админке, и, при PROFILING_LOG,
+    в журнал в виде JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _is_requested(self, request):
+        value = request.META.get(PROFILE_HEADER)
+        if value is not None:
+            if settings.PROFILING_TOKEN:
+                return value == settings.PROFILING_TOKEN
+            return settings.DEBUG
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(profile)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        if self._is_requested(request):
+            self._report(request, response, profile)
+        return response
+
+    def _report(self, request, response, profile):
+        duplicates = profile.get_duplicates()
+        total_ms = profile.total_time * 1000
+        db_ms = profile.db_time * 1000
+        serializer_ms = profile.serializer_time * 1000
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={total_ms:.1f}',
+            f'db;dur={db_ms:.1f};desc="{profile.queries} queries"',
+            f'serializer;dur={serializer_ms:.1f}',
+            f'dup;desc="{sum(count for _, count in duplicates)} duplicated"',
+        ))
+        if duplicates:
+            response['X-Profile-Duplicates'] = ', '.join(
+                f'{fingerprint_hash(sql)}x{count}'
+                for sql, count in duplicates
+            )
+
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'serializer_ms': round(serializer_ms, 1),
+            'queries': profile.queries,
+            'duplicates': [
+                {
+                    'fingerprint': fingerprint_hash(sql),
+                    'count': count,
+                    'sql': sql,
+                }
+                for sql, count in duplicates
+            ],
+        }
+        profile_buffer.append(record)
+        if settings.PROFILING_LOG:
+            logger.info(json.dumps(record, ensure_ascii=False))
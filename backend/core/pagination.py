@@ -1,7 +1,180 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+KEYSET_COUNT_CACHE_PREFIX = 'keyset_count:'
+KEYSET_COUNT_CACHE_TIMEOUT = 60
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
     page_size_query_param = 'limit'
+
+
+class KeysetPaginator:
+    """
+    Постраничная выдача по ключу (keyset) вместо OFFSET/LIMIT.
+
+    Страница выбирается условием по составному ключу сортировки,
+    например (created_at, id), поэтому стоимость запроса не зависит
+    от глубины листания и покрывается составным индексом.
+    """
+
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def __init__(self, ordering, cursor_query_param, page_size):
+        self.ordering = ordering
+        self.cursor_query_param = cursor_query_param
+        self.page_size = page_size
+
+    @staticmethod
+    def _field_name(order):
+        return order.lstrip('-')
+
+    def _invert(self, ordering):
+        return [
+            self._field_name(order) if order.startswith('-') else f'-{order}'
+            for order in ordering
+        ]
+
+    def _after(self, ordering, values):
+        """Условие "строго после values" для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for order, value in zip(ordering, values):
+            field = self._field_name(order)
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _decode_cursor(self, encoded):
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _encode_cursor(self, obj, reverse):
+        values = []
+        for order in self.ordering:
+            value = getattr(obj, self._field_name(order))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return base64.urlsafe_b64encode(
+            json.dumps({'v': values, 'r': int(reverse)}).encode()
+        ).decode()
+
+    def _get_count(self, queryset):
+        """Кэширует COUNT(*) на короткое время: значение приближенное."""
+        sql, params = queryset.query.sql_with_params()
+        key = KEYSET_COUNT_CACHE_PREFIX + hashlib.sha1(
+            repr((sql, params)).encode()
+        ).hexdigest()
+        return cache.get_or_set(
+            key, queryset.count, KEYSET_COUNT_CACHE_TIMEOUT
+        )
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        values, reverse = self._decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+        page_queryset = queryset.order_by(*ordering)
+        if values is not None:
+            page_queryset = page_queryset.filter(
+                self._after(ordering, values)
+            )
+        results = list(page_queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = results
+        self.count = self._get_count(queryset)
+        return results
+
+    def _get_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            remove_query_param(url, 'page'),
+            self.cursor_query_param,
+            self._encode_cursor(obj, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._get_link(self.page[0], reverse=True)
+
+
+class OptionalKeysetPagination(LimitPageNumberPagination):
+    """
+    Постраничная выдача с включаемым режимом keyset.
+
+    Без параметра cursor работает как LimitPageNumberPagination.
+    С параметром cursor (пустым для первой страницы) страницы выбираются
+    по ключу keyset_ordering, а count берется из кэша. Формат ответа
+    count/next/previous/results в обоих режимах одинаковый.
+
+    Выборка со своей сортировкой, например по релевантности поиска или
+    по оценке рекомендаций, листается только по номеру страницы:
+    курсор заменил бы ее сортировкой по ключу, и ответ на cursor - 400.
+    """
+
+    cursor_query_param = 'cursor'
+    keyset_ordering = None
+    keyset = None
+    ordering_conflict_message = (
+        'Курсор нельзя использовать с сортировкой по релевантности, '
+        'листайте по параметру page.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.keyset_ordering is None
+                or self.cursor_query_param not in request.query_params):
+            return super().paginate_queryset(queryset, request, view)
+        if queryset.query.order_by:
+            raise ValidationError(
+                {self.cursor_query_param: [self.ordering_conflict_message]}
+            )
+        self.keyset = KeysetPaginator(
+            self.keyset_ordering,
+            self.cursor_query_param,
+            self.get_page_size(request)
+        )
+        return self.keyset.paginate_queryset(queryset, request)
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.keyset.count),
+            ('next', self.keyset.get_next_link()),
+            ('previous', self.keyset.get_previous_link()),
+            ('results', data),
+        ]))
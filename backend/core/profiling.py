@@ -0,0 +1,107 @@
+"""Сбор статистики SQL-запросов и времени обработки запросов API."""
+
+import contextvars
+import hashlib
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import serializers
+
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    """Статистика одного HTTP-запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка execute_wrapper соединений всех БД для учета запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            # Параметры не входят в отпечаток: одинаковый шаблон запроса
+            # в цикле и есть признак N+1.
+            self.fingerprints[sql] += 1
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def get_duplicates(self):
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common() if count > 1
+        ]
+
+    @contextmanager
+    def serializer_section(self):
+        """Учитывает только внешний вызов, вложенные сериализаторы
+        уже входят в его время."""
+        self._serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._serializer_depth -= 1
+            if not self._serializer_depth:
+                self.serializer_time += time.perf_counter() - started
+
+
+def fingerprint_hash(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()[:8]
+
+
+def _timed_data(data_property):
+    def data(self):
+        profile = current_profile.get()
+        if profile is None:
+            return data_property.fget(self)
+        with profile.serializer_section():
+            return data_property.fget(self)
+    return property(data)
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """Добавляет замер времени в Serializer.data и ListSerializer.data."""
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    for serializer_class in (serializers.Serializer,
+                             serializers.ListSerializer):
+        serializer_class.data = _timed_data(serializer_class.data)
+    _serializer_timing_installed = True
+
+
+class ProfileBuffer:
+    """Последние профили запросов в памяти процесса."""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=size)
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def items(self):
+        with self._lock:
+            return list(reversed(self._items))
+
+
+profile_buffer = ProfileBuffer(settings.PROFILING_BUFFER_SIZE)
@@ -0,0 +1,85 @@
+"""
+Запросы с RETURNING, которых нет в публичном API QuerySet Django 3.2.
+
+Возвращаемые значения показывают, какие строки действительно записаны
+или удалены, поэтому счетчики можно менять по факту, а не по разности,
+посчитанной до записи. Поддерживаются PostgreSQL и SQLite 3.35+.
+"""
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+
+def _returning(model, returning, quote_name):
+    """
+    Список RETURNING и функция разбора строки: returning - имя поля
+    или кортеж имен, тогда строки возвращаются кортежами.
+    """
+    names = (returning,) if isinstance(returning, str) else returning
+    columns = ', '.join(
+        quote_name(model._meta.get_field(name).column) for name in names
+    )
+    if isinstance(returning, str):
+        return columns, lambda row: row[0]
+    return columns, tuple
+
+
+def insert_ignore_conflicts(model, objs, returning, using='default'):
+    """
+    Вставляет объекты одним INSERT ... ON CONFLICT DO NOTHING и
+    возвращает значения поля (полей) returning у действительно
+    вставленных строк. Сигналы не отправляются.
+    """
+    if not objs:
+        return []
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    columns, parse = _returning(model, returning, quote_name)
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    params = []
+    for obj in objs:
+        params.extend(
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in fields
+        )
+    placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(fields))]
+                             * len(objs))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(model._meta.db_table)} '
+            f'({", ".join(quote_name(field.column) for field in fields)}) '
+            f'VALUES {placeholders} ON CONFLICT DO NOTHING '
+            f'RETURNING {columns}',
+            params
+        )
+        return [parse(row) for row in cursor.fetchall()]
+
+
+def delete_returning(queryset, returning):
+    """
+    Удаляет строки queryset одним DELETE и возвращает значения поля
+    (полей) returning у действительно удаленных строк. Сигналы и каскады
+    Django не выполняются, поэтому функция подходит для таблиц связей.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    quote_name = connection.ops.quote_name
+    columns, parse = _returning(model, returning, quote_name)
+    try:
+        sql, params = queryset.order_by().values(
+            'pk'
+        ).query.sql_with_params()
+    except EmptyResultSet:
+        # Условие заведомо ложно, например pk__in=[].
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE {quote_name(model._meta.pk.column)} IN ({sql}) '
+            f'RETURNING {columns}',
+            params
+        )
+        return [parse(row) for row in cursor.fetchall()]
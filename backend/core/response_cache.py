@@ -0,0 +1,95 @@
+"""Кэш ответов API для анонимных пользователей."""
+
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+
+from .conditional import get_versions
+from .db_router import replica_may_lag
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_PREFIX = 'response:'
+HITS_KEY = 'response_cache:hits'
+MISSES_KEY = 'response_cache:misses'
+
+
+def _get_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def _record(key):
+    response_cache = _get_cache()
+    try:
+        response_cache.incr(key)
+    except ValueError:
+        response_cache.add(key, 0, None)
+        response_cache.incr(key)
+
+
+def get_stats():
+    """Возвращает число попаданий и промахов кэша ответов."""
+    stats = _get_cache().get_many((HITS_KEY, MISSES_KEY))
+    return stats.get(HITS_KEY, 0), stats.get(MISSES_KEY, 0)
+
+
+def reset_stats():
+    _get_cache().delete_many((HITS_KEY, MISSES_KEY))
+
+
+def _build_key(request, query_params, versions):
+    params = request.query_params
+    normalized = [
+        (name, sorted(params.getlist(name)))
+        for name in query_params if name in params
+    ]
+    raw = repr((request.path, normalized, [token for token, _ in versions]))
+    return RESPONSE_CACHE_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cache_anonymous_response(get_version_keys, query_params=(),
+                             ignored_params=()):
+    """
+    Декоратор представления, кэширующий данные ответа для анонимов.
+
+    Ключ строится из пути, нормализованных параметров query_params
+    и токенов версий из get_version_keys, поэтому изменение данных
+    делает старые записи недостижимыми без перебора ключей.
+    Параметры из ignored_params не влияют на ответ анониму, при любых
+    других параметрах кэш не используется. Ответ, прочитанный с реплики,
+    которая может отставать от последней версии, не сохраняется.
+    """
+    allowed_params = set(query_params) | set(ignored_params)
+
+    def decorator(func):
+        @wraps(func)
+        def inner(request, *args, **kwargs):
+            if (request.user.is_authenticated
+                    or set(request.query_params) - allowed_params):
+                return func(request, *args, **kwargs)
+
+            versions = get_versions(
+                get_version_keys(request, *args, **kwargs)
+            )
+            key = _build_key(request, query_params, versions)
+            replica_lags = replica_may_lag(
+                max(timestamp for _, timestamp in versions)
+            )
+            data = _get_cache().get(key)
+            if data is not None:
+                _record(HITS_KEY)
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+            else:
+                _record(MISSES_KEY)
+                response = func(request, *args, **kwargs)
+                if response.status_code == 200 and not replica_lags:
+                    _get_cache().set(key, response.data)
+                response['X-Cache'] = 'MISS'
+            patch_vary_headers(response, ('Authorization',))
+            return response
+
+        return inner
+    return decorator
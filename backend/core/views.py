@@ -0,0 +1,13 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .profiling import profile_buffer
+
+
+@staff_member_required
+def profiling_view(request):
+    """Последние профили запросов, новые первыми."""
+    return JsonResponse(
+        {'results': profile_buffer.items()},
+        json_dumps_params={'ensure_ascii': False, 'indent': 2}
+    )
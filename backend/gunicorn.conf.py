@@ -0,0 +1,37 @@
+"""
+Настройки gunicorn.
+
+SERVER_MODE=sync - синхронные воркеры WSGI, по одному запросу на поток.
+SERVER_MODE=async - воркеры uvicorn с ASGI-приложением, синхронные
+представления выполняются в пуле из ASGI_THREADS потоков.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# Версии данных, кэш ответов и множества пользователей должны быть общими
+# для воркеров: с кэшем в памяти процесса изменение видит только воркер,
+# который его выполнил.
+if workers > 1 and LOCAL_CACHE in (
+    os.getenv('CACHE_BACKEND', LOCAL_CACHE),
+    os.getenv('RESPONSE_CACHE_BACKEND', LOCAL_CACHE),
+):
+    raise RuntimeError(
+        'GUNICORN_WORKERS > 1 требует общего кэша: задайте CACHE_BACKEND '
+        'и RESPONSE_CACHE_BACKEND, например django_redis.cache.RedisCache'
+    )
+
+if os.getenv('SERVER_MODE', 'sync') == 'async':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+    threads = int(os.getenv('GUNICORN_THREADS', 1))
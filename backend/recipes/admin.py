@@ -1,41 +1,32 @@
+from core.images import get_image_url
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.utils.html import format_html
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShortLink, Tag)
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """Админ-панель для модели Tag."""
 
-    list_display = ('name', 'slug', 'recipe_count')
+    list_display = ('name', 'slug', 'recipes_count')
     search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
     save_on_top = True
     list_per_page = 20
 
-    @admin.display(description='Рецептов с тегом')
-    def recipe_count(self, obj):
-        """Возвращает количество рецептов с тегом."""
-        return obj.recipes.count()
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     """Админ-панель для модели Ingredient."""
 
-    list_display = ('name', 'measurement_unit', 'recipe_count')
+    list_display = ('name', 'measurement_unit', 'recipes_count')
     search_fields = ('name', 'measurement_unit')
     list_filter = ('measurement_unit',)
     ordering = ('name',)
 
-    @admin.display(description='Используется в рецептах')
-    def recipe_count(self, obj):
-        """Возвращает количество рецептов с ингредиентом."""
-        return obj.recipeingredients.count()
-
     def save_model(self, request, obj, form, change):
         """Проверяет уникальность ингредиента перед сохранением."""
         if Ingredient.objects.filter(
@@ -50,27 +41,26 @@ class IngredientAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     """Админ-панель для модели Recipe."""
 
-    list_display = ('name', 'author', 'favorite_count',
+    list_display = ('name', 'author', 'favorites_count',
                     'cooking_time', 'created_at', 'image_preview')
     search_fields = ('name', 'author__username', 'text')
     list_filter = ('tags', 'author', 'created_at')
     filter_horizontal = ('tags', 'ingredients')
     autocomplete_fields = ['author']
-    readonly_fields = ('created_at', 'image_preview')
+    list_select_related = ('author',)
+    readonly_fields = ('created_at', 'favorites_count', 'image_preview')
     date_hierarchy = 'created_at'
     save_on_top = True
     list_per_page = 25
 
-    @admin.display(description='В избранном')
-    def favorite_count(self, obj):
-        """Возвращает количество добавлений рецепта в избранное."""
-        return obj.favorites.count()
-
     @admin.display(description='Превью')
     def image_preview(self, obj):
         """Отображает миниатюру изображения рецепта."""
         if obj.image:
-            return format_html('<img src="{}" width="100" />', obj.image.url)
+            return format_html(
+                '<img src="{}" width="100" />',
+                get_image_url(obj, 'image', 'thumb')
+            )
         return "Нет изображения"
 
 
@@ -102,3 +92,14 @@ class FavoriteAdmin(admin.ModelAdmin):
     autocomplete_fields = ['user', 'recipe']
     date_hierarchy = 'created_at'
     list_per_page = 50
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    """Админ-панель для модели ShortLink."""
+
+    list_display = ('code', 'recipe', 'clicks', 'created_at')
+    search_fields = ('code', 'recipe__name')
+    autocomplete_fields = ['recipe']
+    readonly_fields = ('clicks',)
+    list_per_page = 50
@@ -0,0 +1,97 @@
+"""Автодополнение названий ингредиентов по префиксу."""
+
+import threading
+from bisect import bisect_left
+
+from core.db_router import primary_reads
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Ingredient
+
+INDEX_VERSION_CACHE_KEY = 'recipes:ingredient_index_version'
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+EMPTY_INDEX = (None, (), ())
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный по названию в нижнем регистре справочник ингредиентов.
+
+    Индекс строится лениво при первом запросе и сбрасывается сигналами
+    модели Ingredient. Номер версии хранится в общем кэше, поэтому
+    изменения, сделанные в одном процессе, видны и в остальных.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Версия, ключи и элементы заменяются одним присваиванием, и
+        # запрос читает кортеж один раз: перестройка индекса в другом
+        # потоке не смешивает новые ключи со старыми элементами.
+        self._index = EMPTY_INDEX
+
+    def invalidate(self):
+        """Сбрасывает индекс во всех процессах."""
+        try:
+            cache.incr(INDEX_VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(INDEX_VERSION_CACHE_KEY, 1, None)
+        with self._lock:
+            self._index = EMPTY_INDEX
+
+    def _get_shared_version(self):
+        return cache.get_or_set(INDEX_VERSION_CACHE_KEY, 0, None)
+
+    def _build(self):
+        entries = sorted(
+            (name.casefold(), name, measurement_unit, pk)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).order_by()
+        )
+        keys = tuple(entry[0] for entry in entries)
+        items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, name, measurement_unit, pk in entries
+        )
+        return keys, items
+
+    def _get_data(self):
+        version = self._get_shared_version()
+        index = self._index
+        if index[0] != version:
+            with self._lock:
+                index = self._index
+                if index[0] != version:
+                    with primary_reads():
+                        keys, items = self._build()
+                    index = self._index = (version, keys, items)
+        return index[1], index[2]
+
+    def search(self, prefix, limit=None):
+        """Возвращает ингредиенты, название которых начинается с prefix."""
+        keys, items = self._get_data()
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_UPPER_BOUND, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(items[start:end])
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+def search_ingredients(prefix, limit=None):
+    """
+    Ищет ингредиенты по началу названия без учета регистра.
+
+    В режиме memory поиск идет по индексу в памяти процесса, в режиме
+    database - запросом к базе, который использует индекс
+    по UPPER(name) с text_pattern_ops.
+    """
+    if settings.INGREDIENT_AUTOCOMPLETE_BACKEND == 'memory':
+        return ingredient_index.search(prefix, limit)
+    queryset = Ingredient.objects.filter(
+        name__istartswith=prefix
+    ).values('id', 'name', 'measurement_unit')
+    return list(queryset[:limit])
@@ -0,0 +1,100 @@
+"""Массовое добавление и удаление рецептов в избранном и списке покупок."""
+
+from core.conditional import bump_versions, membership_version_key
+from core.counters import change_counter
+from core.queries import delete_returning, insert_ignore_conflicts
+from django.db import transaction
+from recipes.membership import enqueue_membership_changes
+from recipes.models import Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import schedule_shopping_list_refresh
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def bulk_change_user_recipes(user, model, add=(), remove=(),
+                             counter_field=None):
+    """
+    Добавляет рецепты add и удаляет рецепты remove в одной транзакции
+    и возвращает статус каждого id.
+
+    Массовые операции не отправляют сигналы, поэтому счетчик рецепта
+    counter_field и версия пользователя обновляются здесь.
+    """
+    with transaction.atomic():
+        found = set(Recipe.objects.filter(
+            pk__in={*add, *remove}
+        ).values_list('pk', flat=True))
+        # Статусы и счетчики считаются по строкам, которые INSERT и DELETE
+        # действительно изменили: параллельный запрос мог успеть раньше.
+        # Обычный delete() отправляет post_delete для каждой строки
+        # и обновляет счетчик каждой отдельным запросом.
+        added = insert_ignore_conflicts(
+            model,
+            [model(user=user, recipe_id=pk) for pk in add if pk in found],
+            returning='recipe'
+        )
+        removed = delete_returning(
+            model.objects.filter(user=user, recipe_id__in=remove),
+            returning='recipe'
+        )
+
+        if counter_field:
+            change_counter(
+                Recipe.objects.filter(pk__in=added), counter_field, 1
+            )
+            change_counter(
+                Recipe.objects.filter(pk__in=removed), counter_field, -1
+            )
+        if added or removed:
+            bump_versions(membership_version_key(user.pk))
+        if model is ShoppingCart:
+            schedule_shopping_list_refresh(
+                (user.pk,),
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=added + removed
+                ).values_list('ingredient_id', flat=True).distinct()
+            )
+
+    added, removed = set(added), set(removed)
+
+    def get_status(pk, is_added):
+        if pk not in found:
+            return NOT_FOUND
+        if is_added:
+            return ADDED if pk in added else EXISTS
+        return REMOVED if pk in removed else ABSENT
+
+    return [
+        {'id': pk, 'status': get_status(pk, True)} for pk in add
+    ] + [
+        {'id': pk, 'status': get_status(pk, False)} for pk in remove
+    ]
+
+
+def enqueue_user_recipes_changes(request, kind, add=(), remove=()):
+    """
+    То же, что bulk_change_user_recipes, в режиме WRITE_BEHIND_ENABLED:
+    изменения записываются в журнал отложенной записи, а статусы
+    считаются по множествам пользователя с учетом ожидающих изменений.
+    """
+    found = set(Recipe.objects.filter(
+        pk__in={*add, *remove}
+    ).values_list('pk', flat=True))
+    changes = [(pk, True) for pk in add] + [(pk, False) for pk in remove]
+    changed = iter(enqueue_membership_changes(request, kind, [
+        (pk, is_added) for pk, is_added in changes if pk in found
+    ]))
+    results = []
+    for pk, is_added in changes:
+        if pk not in found:
+            status = NOT_FOUND
+        elif next(changed):
+            status = ADDED if is_added else REMOVED
+        else:
+            status = EXISTS if is_added else ABSENT
+        results.append({'id': pk, 'status': status})
+    return results
@@ -9,3 +9,17 @@ MAX_COOKING_TIME = 32767
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32767
 TEXT_TRUNCATION = 20
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_FILENAME = 'ShoppingList'
+SHOPPING_LIST_PDF_FONT_SIZE = 12
+SHOPPING_LIST_PDF_LINE_HEIGHT = 18
+INGREDIENT_AUTOCOMPLETE_LIMIT = 10
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 100
+BULK_RECIPES_MAX_LENGTH = 500
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_BLOCK_SIZE = 256
+RECOMMENDATIONS_INGREDIENT_WEIGHT = 0.5
+RECOMMENDATIONS_CO_FAVORITE_WEIGHT = 0.5
+RECOMMENDATIONS_CART_WEIGHT = 0.5
+SHORT_LINK_CODE_LENGTH = 6
+SHORT_LINK_CODE_MAX_LENGTH = 16
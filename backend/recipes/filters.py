@@ -1,5 +1,11 @@
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
 
 
 class IngredientFilter(filters.FilterSet):
@@ -12,19 +18,61 @@ class IngredientFilter(filters.FilterSet):
         fields = ['name']
 
 
+class MultipleValueField(forms.Field):
+    """Все значения повторяющегося параметра без списка допустимых."""
+
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class MultipleValueFilter(filters.Filter):
+    field_class = MultipleValueField
+
+
 class RecipeFilter(filters.FilterSet):
     """Фильтр для поиска рецептов по различным параметрам."""
 
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    # Варианты тегов не перечисляются: AllValuesMultipleFilter читал
+    # все slug из БД в каждом запросе.
+    tags = MultipleValueFilter(method='get_tags')
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой из тегов'),
+                 (TAGS_MATCH_ALL, 'Все теги')),
+        method='get_tags_match'
+    )
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
     author = filters.NumberFilter(field_name='author__id')
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'tags', 'tags_match', 'author', 'is_favorited',
+            'is_in_shopping_cart', 'search'
+        ]
+
+    def get_tags(self, queryset, name, value):
+        """
+        Рецепты с любым из тегов или, при tags_match=all, со всеми.
+        Подзапрос EXISTS не размножает строки, поэтому DISTINCT не нужен.
+        """
+        through = Recipe.tags.through.objects.filter(recipe=OuterRef('pk'))
+        if self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL:
+            for slug in set(value):
+                queryset = queryset.filter(
+                    Exists(through.filter(tag__slug=slug))
+                )
+            return queryset
+        return queryset.filter(Exists(through.filter(tag__slug__in=value)))
+
+    def get_tags_match(self, queryset, name, value):
+        """Режим применяется в get_tags."""
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         """Фильтрует рецепты по наличию в избранном."""
@@ -37,3 +85,7 @@ class RecipeFilter(filters.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_carts__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск с сортировкой по релевантности."""
+        return search_recipes(queryset, value)
@@ -0,0 +1,331 @@
+"""Потоковый импорт ингредиентов, тегов и рецептов."""
+
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from core.conditional import (INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY,
+                              bump_versions)
+from core.counters import recount_counter
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from recipes.autocomplete import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import update_search_vectors
+from recipes.shopping_list import schedule_recipe_shopping_list_refresh
+from recipes.signals import bump_recipe_versions
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Построчно разбирает JSON-массив объектов, не читая файл целиком.
+
+    В памяти держится только текущий фрагмент файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив.')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            item, end = None, None
+        if end is None or (end == len(buffer) and not eof):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                if eof:
+                    raise ValueError('Неожиданный конец JSON-массива.')
+                eof = True
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(file, fieldnames):
+    """Читает CSV с заголовком или без него, как data/ingredients.csv."""
+    reader = csv.reader(file)
+    for row in reader:
+        if tuple(row) == tuple(fieldnames):
+            continue
+        yield dict(zip(fieldnames, row))
+
+
+def iter_records(path, fieldnames, file_format=None):
+    """Возвращает записи файла в формате json, jsonl или csv."""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.')
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'json':
+            yield from iter_json_array(file)
+        elif file_format == 'jsonl':
+            yield from iter_jsonl(file)
+        elif file_format == 'csv':
+            yield from iter_csv(file, fieldnames)
+        else:
+            raise ValueError(f'Неподдерживаемый формат: {file_format}')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BaseImporter:
+    """
+    Импорт записей пачками, каждая пачка - в отдельной транзакции.
+
+    Повторный импорт тех же данных ничего не дублирует. Массовые
+    операции не отправляют сигналы, поэтому кэши, счетчики и поисковые
+    векторы обновляются в finalize().
+    """
+
+    fieldnames = ()
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, on_progress=None):
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.skipped = 0
+
+    def import_batch(self, records):
+        raise NotImplementedError
+
+    def finalize(self):
+        pass
+
+    def run(self, records):
+        """Импортирует записи и возвращает (количество, секунды)."""
+        started = time.perf_counter()
+        total = 0
+        for batch in batched(records, self.batch_size):
+            with transaction.atomic():
+                self.import_batch(batch)
+            total += len(batch)
+            if self.on_progress:
+                self.on_progress(total, time.perf_counter() - started)
+        self.finalize()
+        return total, time.perf_counter() - started
+
+
+class IngredientImporter(BaseImporter):
+    """Ингредиенты уникальны по (name, measurement_unit)."""
+
+    fieldnames = ('name', 'measurement_unit')
+
+    def import_batch(self, records):
+        # Кроме ключа уникальности обновлять нечего, поэтому пропуск
+        # конфликтов равносилен upsert.
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=record['name'],
+                    measurement_unit=record['measurement_unit']
+                ) for record in records
+            ],
+            ignore_conflicts=True
+        )
+
+    def finalize(self):
+        ingredient_index.invalidate()
+        bump_versions(INGREDIENTS_VERSION_KEY)
+
+
+class TagImporter(BaseImporter):
+    """Теги сопоставляются по slug, название обновляется."""
+
+    fieldnames = ('name', 'slug')
+
+    def import_batch(self, records):
+        names = {record['slug']: record['name'] for record in records}
+        existing = Tag.objects.in_bulk(names, field_name='slug')
+        changed = []
+        for slug, tag in existing.items():
+            if tag.name != names[slug]:
+                tag.name = names[slug]
+                changed.append(tag)
+        Tag.objects.bulk_update(changed, ('name',))
+        Tag.objects.bulk_create(
+            [
+                Tag(name=name, slug=slug)
+                for slug, name in names.items() if slug not in existing
+            ],
+            ignore_conflicts=True
+        )
+
+    def finalize(self):
+        bump_versions(TAGS_VERSION_KEY)
+
+
+class RecipeImporter(BaseImporter):
+    """
+    Рецепты сопоставляются по автору (email) и названию.
+
+    Запись содержит name, text, cooking_time, author, image, tags
+    (список slug) и ingredients (name, measurement_unit, amount).
+    Связи с тегами и ингредиентами приводятся к данным файла.
+    """
+
+    fieldnames = ('name', 'text', 'cooking_time', 'author', 'image')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recipe_ids = set()
+
+    def _get_recipes(self, keys):
+        recipes = Recipe.objects.filter(
+            author_id__in={author_id for author_id, _ in keys},
+            name__in={name for _, name in keys},
+        )
+        return {
+            (recipe.author_id, recipe.name): recipe for recipe in recipes
+            if (recipe.author_id, recipe.name) in keys
+        }
+
+    def _save_recipes(self, records, authors):
+        rows = {}
+        for record in records:
+            author = authors.get(record['author'])
+            if author is None:
+                self.skipped += 1
+                continue
+            rows[(author.pk, record['name'])] = record
+
+        existing = self._get_recipes(rows)
+        changed = []
+        for key, recipe in existing.items():
+            record = rows[key]
+            recipe.text = record['text']
+            recipe.cooking_time = int(record['cooking_time'])
+            recipe.image = record.get('image', recipe.image)
+            changed.append(recipe)
+        Recipe.objects.bulk_update(changed, ('text', 'cooking_time', 'image'))
+        Recipe.objects.bulk_create([
+            Recipe(
+                author_id=author_id,
+                name=name,
+                text=rows[(author_id, name)]['text'],
+                cooking_time=int(rows[(author_id, name)]['cooking_time']),
+                image=rows[(author_id, name)].get('image', ''),
+            )
+            for author_id, name in rows if (author_id, name) not in existing
+        ])
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем.
+        recipes = self._get_recipes(rows)
+        return [(recipes[key], record) for key, record in rows.items()]
+
+    def _sync_tags(self, recipes):
+        slugs = {
+            slug for _, record in recipes for slug in record.get('tags', ())
+        }
+        tags = Tag.objects.in_bulk(slugs, field_name='slug')
+        through = Recipe.tags.through
+        wanted = {
+            (recipe.pk, tags[slug].pk)
+            for recipe, record in recipes
+            for slug in record.get('tags', ()) if slug in tags
+        }
+        existing = set(through.objects.filter(
+            recipe_id__in=[recipe.pk for recipe, _ in recipes]
+        ).values_list('recipe_id', 'tag_id'))
+        removed = {}
+        for recipe_id, tag_id in existing - wanted:
+            removed.setdefault(recipe_id, []).append(tag_id)
+        for recipe_id, tag_ids in removed.items():
+            through.objects.filter(
+                recipe_id=recipe_id, tag_id__in=tag_ids
+            ).delete()
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, tag_id in wanted - existing
+        ])
+
+    def _sync_ingredients(self, recipes):
+        names = {
+            item['name']
+            for _, record in recipes for item in record.get('ingredients', ())
+        }
+        ingredients = {
+            (ingredient.name, ingredient.measurement_unit): ingredient.pk
+            for ingredient in Ingredient.objects.filter(name__in=names)
+        }
+        wanted = {}
+        for recipe, record in recipes:
+            for item in record.get('ingredients', ()):
+                ingredient_id = ingredients.get(
+                    (item['name'], item['measurement_unit'])
+                )
+                if ingredient_id is not None:
+                    wanted[(recipe.pk, ingredient_id)] = int(item['amount'])
+        existing = {
+            (link.recipe_id, link.ingredient_id): link
+            for link in RecipeIngredient.objects.filter(
+                recipe_id__in=[recipe.pk for recipe, _ in recipes]
+            )
+        }
+        RecipeIngredient.objects.filter(pk__in=[
+            link.pk for key, link in existing.items() if key not in wanted
+        ]).delete()
+        changed = []
+        for key, link in existing.items():
+            if key in wanted and link.amount != wanted[key]:
+                link.amount = wanted[key]
+                changed.append(link)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for (recipe_id, ingredient_id), amount in wanted.items()
+            if (recipe_id, ingredient_id) not in existing
+        ])
+
+    def import_batch(self, records):
+        authors = User.objects.in_bulk(
+            {record['author'] for record in records}, field_name='email'
+        )
+        recipes = self._save_recipes(records, authors)
+        self._sync_tags(recipes)
+        self._sync_ingredients(recipes)
+        self.recipe_ids.update(recipe.pk for recipe, _ in recipes)
+
+    def finalize(self):
+        for model, field, related_model, related_field in (
+            (Tag, 'recipes_count', Recipe.tags.through, 'tag'),
+            (Ingredient, 'recipes_count', RecipeIngredient, 'ingredient'),
+            (User, 'recipes_count', Recipe, 'author'),
+        ):
+            recount_counter(model, field, related_model, related_field)
+        update_search_vectors(self.recipe_ids)
+        bump_recipe_versions(self.recipe_ids, tag_feed=True)
+        schedule_recipe_shopping_list_refresh(self.recipe_ids)
+
+
+IMPORTERS = {
+    'ingredients': IngredientImporter,
+    'tags': TagImporter,
+    'recipes': RecipeImporter,
+}
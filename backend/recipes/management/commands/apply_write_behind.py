@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.write_behind import mutation_log, write_behind_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет журнал отложенной записи избранного, корзины и подписок: '
+        'например, после падения процессов или перед выключением режима.'
+    )
+
+    def handle(self, *args, **options):
+        pending = len(mutation_log)
+        if pending:
+            self.stdout.write(
+                f'Изменений в журнале: {pending}, самое старое ждет '
+                f'{time.time() - mutation_log.oldest():.1f} с'
+            )
+        applied = write_behind_worker.drain()
+        if pending and not applied:
+            self.stdout.write(
+                'Журнал применяет другой процесс, изменений в очереди - '
+                f'{pending}'
+            )
+            return
+        self.stdout.write(f'Применено изменений: {applied}')
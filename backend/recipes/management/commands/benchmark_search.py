@@ -0,0 +1,127 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.search import search_recipes, update_search_vectors
+
+User = get_user_model()
+
+BENCHMARK_EMAIL = 'search-benchmark@foodgram.local'
+BATCH_SIZE = 2000
+INGREDIENTS_PER_RECIPE = 8
+WORDS_IN_NAME = 3
+WORDS_IN_TEXT = 40
+RESULTS_LIMIT = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает полнотекстовый поиск рецептов с поиском icontains. '
+        'Может предварительно сгенерировать синтетические рецепты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сколько синтетических рецептов создать, например 100000.'
+        )
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help='Удалить синтетические рецепты после замеров.'
+        )
+
+    def _seed(self, count, words):
+        author, _ = User.objects.get_or_create(
+            email=BENCHMARK_EMAIL,
+            defaults={
+                'username': 'search-benchmark',
+                'first_name': 'Benchmark',
+                'last_name': 'Benchmark',
+            }
+        )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        for start in range(0, count, BATCH_SIZE):
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create([
+                    Recipe(
+                        author=author,
+                        name=' '.join(random.sample(words, WORDS_IN_NAME)),
+                        text=' '.join(random.choices(words, k=WORDS_IN_TEXT)),
+                        cooking_time=random.randint(5, 120),
+                        image='recipes/benchmark.png',
+                    ) for _ in range(min(BATCH_SIZE, count - start))
+                ])
+                if not recipes[0].pk:
+                    recipes = Recipe.objects.filter(
+                        author=author
+                    ).order_by('-pk')[:len(recipes)]
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient_id=ingredient_id,
+                        amount=random.randint(1, 500),
+                    )
+                    for recipe in recipes
+                    for ingredient_id in random.sample(
+                        ingredient_ids,
+                        min(INGREDIENTS_PER_RECIPE, len(ingredient_ids))
+                    )
+                ])
+            self.stdout.write(f'Создано рецептов: {start + len(recipes)}')
+        update_search_vectors()
+        call_command('recount_counters', stdout=self.stdout)
+
+    def _measure(self, name, run, queries):
+        run(queries[0])
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'{name}: среднее {statistics.mean(timings):.2f} мс, '
+            f'p50 {timings[len(timings) // 2]:.2f} мс, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс'
+        )
+
+    def handle(self, *args, **options):
+        words = sorted({
+            word
+            for name in Ingredient.objects.values_list('name', flat=True)
+            for word in name.split() if len(word) > 3
+        })
+        if not words:
+            self.stderr.write('Сначала загрузите ингредиенты.')
+            return
+        if options['seed']:
+            self._seed(options['seed'], words)
+        self.stdout.write(f'Рецептов в базе: {Recipe.objects.count()}')
+
+        queries = random.choices(words, k=options['queries'])
+        self._measure(
+            'Полнотекстовый поиск',
+            lambda query: list(search_recipes(
+                Recipe.objects.all(), query
+            )[:RESULTS_LIMIT]),
+            queries
+        )
+        self._measure(
+            'icontains',
+            lambda query: list(Recipe.objects.filter(
+                Q(name__icontains=query) | Q(text__icontains=query)
+            )[:RESULTS_LIMIT]),
+            queries
+        )
+        if options['cleanup']:
+            User.objects.filter(email=BENCHMARK_EMAIL).delete()
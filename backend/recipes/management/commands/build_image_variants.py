@@ -0,0 +1,80 @@
+from concurrent.futures import wait
+
+from core.images import (SOURCE_KEY, executor, process_image,
+                         strip_stored_metadata)
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.signals import bump_recipe_versions
+from users.signals import refresh_avatar_dependents
+
+User = get_user_model()
+
+IMAGE_FIELDS = (
+    (Recipe, 'image', lambda pk: bump_recipe_versions((pk,))),
+    (User, 'avatar', refresh_avatar_dependents),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры и WebP-варианты картинок рецептов и аватаров, '
+        'у которых их еще нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить варианты для всех изображений.'
+        )
+        parser.add_argument(
+            '--strip-originals',
+            action='store_true',
+            help=(
+                'Удалить метаданные из исходных файлов, загруженных '
+                'до их очистки при загрузке.'
+            )
+        )
+
+    def strip_originals(self, model, field_name):
+        stripped = 0
+        for pk, source in model.objects.exclude(
+            **{field_name: ''}
+        ).exclude(
+            **{f'{field_name}__isnull': True}
+        ).values_list('pk', field_name):
+            try:
+                name = strip_stored_metadata(source)
+            except FileNotFoundError:
+                continue
+            if name != source:
+                model.objects.filter(pk=pk).update(**{field_name: name})
+            stripped += 1
+        self.stdout.write(
+            f'{model.__name__}.{field_name}: проверено файлов - {stripped}'
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name, on_done in IMAGE_FIELDS:
+            if options['strip_originals']:
+                self.strip_originals(model, field_name)
+            variants_field = f'{field_name}_variants'
+            pending = [
+                pk
+                for pk, source, variants in model.objects.exclude(
+                    **{field_name: ''}
+                ).exclude(
+                    **{f'{field_name}__isnull': True}
+                ).values_list('pk', field_name, variants_field)
+                if options['force'] or variants.get(SOURCE_KEY) != source
+            ]
+            wait([
+                executor.submit(
+                    process_image, model, pk, field_name, variants_field,
+                    on_done
+                ) for pk in pending
+            ])
+            self.stdout.write(
+                f'{model.__name__}.{field_name}: обработано - {len(pending)}'
+            )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from recipes.constants import RECOMMENDATIONS_BLOCK_SIZE, RECOMMENDATIONS_TOP_K
+from recipes.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по ингредиентам и совместному '
+        'избранному для /similar/ и /recommended/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=RECOMMENDATIONS_TOP_K,
+            help='Сколько похожих рецептов хранить для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=RECOMMENDATIONS_BLOCK_SIZE,
+            help='Сколько рецептов обрабатывать за один шаг.'
+        )
+
+    def handle(self, *args, **options):
+        count = build_recommendations(
+            options['top_k'], options['block_size']
+        )
+        self.stdout.write(f'Сохранено похожих рецептов: {count}')
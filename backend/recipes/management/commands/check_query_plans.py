@@ -0,0 +1,155 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+from recipes.filters import TAGS_MATCH_ALL
+from recipes.models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                            Tag)
+from recipes.pagination import RecipePagination
+from recipes.views import RecipeViewSet
+from users.models import Subscription
+from users.pagination import SubscriptionPagination
+from users.views import get_subscriptions
+
+User = get_user_model()
+
+PAGE_LIMIT = 6
+# Таблицы, которые растут вместе с данными: полный просмотр любой из них
+# в плане основного запроса считается ошибкой.
+CHECKED_TABLES = {
+    model._meta.db_table
+    for model in (Recipe, Recipe.tags.through, RecipeIngredient, Favorite,
+                  ShoppingCart, Subscription)
+}
+POSTGRESQL_SEQ_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+POSTGRESQL_SORT_RE = re.compile(r'(?:^|->)\s*Sort\b', re.MULTILINE)
+SQLITE_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?(\w+)(.*)')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def find_seq_scans(plan):
+    """Таблицы из CHECKED_TABLES, которые план читает целиком."""
+    if connection.vendor == 'postgresql':
+        tables = POSTGRESQL_SEQ_SCAN_RE.findall(plan)
+    else:
+        tables = [
+            table for line in plan.splitlines()
+            for table, rest in SQLITE_SCAN_RE.findall(line)
+            if 'USING' not in rest
+        ]
+    return sorted(set(tables) & CHECKED_TABLES)
+
+
+def has_sort(plan):
+    """Сортирует ли план строки отдельным шагом, а не читает по индексу."""
+    if connection.vendor == 'postgresql':
+        return bool(POSTGRESQL_SORT_RE.search(plan))
+    return SQLITE_SORT in plan
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для основных запросов API и завершается '
+        'с ошибкой, если они читают большие таблицы целиком, а не по '
+        'индексу, или сортируют строки, порядок которых должен давать '
+        'индекс. Данные для проверки можно создать командой '
+        'generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Выводить планы всех запросов.'
+        )
+
+    @staticmethod
+    def _get_recipes(user, **params):
+        """
+        Выборка ленты рецептов, как ее строит RecipeViewSet.list с
+        параметрами params: queryset представления и RecipeFilter.
+        Порядок - как у страниц keyset, он же покрывается индексом.
+        """
+        view = RecipeViewSet(
+            action_map={'get': 'list'}, format_kwarg=None, args=(),
+            kwargs={}
+        )
+        view.request = view.initialize_request(
+            RequestFactory().get('/api/recipes/', params)
+        )
+        view.request.user = user
+        return view.filter_queryset(view.get_queryset()).order_by(
+            *RecipePagination.keyset_ordering
+        )
+
+    def _get_queries(self):
+        user = User.objects.annotate(
+            favorites_total=Count('favorites')
+        ).order_by('-favorites_total', 'pk').first()
+        author = User.objects.order_by('-recipes_count', 'pk').first()
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if user is None or not slugs:
+            raise CommandError(
+                'Недостаточно данных для проверки, запустите generate_data.'
+            )
+        recipes = self._get_recipes
+        # Название: (запрос, должен ли порядок браться из индекса).
+        # Только с тегами лента читает id из индекса тегов в памяти;
+        # фильтр RecipeFilter по тегам работает вместе с другими
+        # параметрами, например с author или cursor.
+        return {
+            'Лента рецептов': (recipes(user), True),
+            'Рецепты автора': (recipes(user, author=author.pk), True),
+            'Рецепты по тегам': (recipes(user, tags=slugs), False),
+            'Рецепты со всеми тегами': (
+                recipes(user, tags=slugs, tags_match=TAGS_MATCH_ALL), False
+            ),
+            'Избранное': (recipes(user, is_favorited=1), False),
+            'Список покупок': (recipes(user, is_in_shopping_cart=1), False),
+            'Подписки': (
+                get_subscriptions(user).order_by(
+                    *SubscriptionPagination.keyset_ordering
+                ),
+                True
+            ),
+            'Избранное по дате': (
+                Favorite.objects.filter(user=user).order_by('-created_at'),
+                True
+            ),
+            'Корзина по дате': (
+                ShoppingCart.objects.filter(user=user).order_by('-created_at'),
+                True
+            ),
+        }
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # На небольших таблицах PostgreSQL выбирает полный
+                # просмотр и при наличии индекса. С выключенным seqscan
+                # он остается в плане, только если подходящего индекса
+                # нет.
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            queries = self._get_queries().items()
+            for name, (queryset, index_ordered) in queries:
+                plan = queryset[:PAGE_LIMIT].explain()
+                problems = [
+                    f'полный просмотр {table}'
+                    for table in find_seq_scans(plan)
+                ]
+                if index_ordered and has_sort(plan):
+                    problems.append('сортировка без индекса')
+                self.stdout.write(f'{name}: {", ".join(problems) or "OK"}')
+                if options['verbose_plans'] or problems:
+                    self.stdout.write(plan)
+                if problems:
+                    failures.append(name)
+        if failures:
+            raise CommandError(
+                'Запросы без подходящих индексов: ' + ', '.join(failures)
+            )
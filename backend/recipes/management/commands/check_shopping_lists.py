@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from recipes.shopping_list import (find_shopping_list_mismatches,
+                                   refresh_shopping_lists)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет материализованные списки покупок с корзинами '
+        'и, при --fix, пересчитывает разошедшиеся строки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересчитать списки пользователей с расхождениями.'
+        )
+
+    def handle(self, *args, **options):
+        mismatches = find_shopping_list_mismatches()
+        for (user_id, ingredient_id), (stored, expected) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'сохранено {stored}, ожидается {expected}'
+            )
+        self.stdout.write(f'Расхождений: {len(mismatches)}')
+        if mismatches and options['fix']:
+            user_ids = {user_id for user_id, _ in mismatches}
+            for user_id in user_ids:
+                refresh_shopping_lists((user_id,))
+            self.stdout.write(
+                f'Пересчитаны списки пользователей: {len(user_ids)}'
+            )
@@ -0,0 +1,281 @@
+import os
+import time
+
+import numpy as np
+from config.settings import JSON_FILES_DIR
+from core.conditional import (RECIPE_TAGS_VERSION_KEY, RECIPES_VERSION_KEY,
+                              bump_versions)
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.importers import IngredientImporter, iter_records
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import update_search_vectors
+from recipes.shopping_list import refresh_shopping_lists
+from users.models import Subscription
+
+User = get_user_model()
+
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.foodgram.local'
+SYNTHETIC_PASSWORD = 'synthetic-password'
+SYNTHETIC_IMAGE = 'recipes/synthetic.png'
+SYNTHETIC_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'bakery'),
+)
+MIN_INGREDIENTS = 5
+MAX_INGREDIENTS = 20
+MAX_TAGS = 3
+WORDS_IN_NAME = 3
+WORDS_IN_TEXT = 60
+# Показатель степенного распределения популярности авторов и рецептов:
+# небольшая часть рецептов собирает большую часть избранного.
+POPULARITY_EXPONENT = 1.1
+
+
+def get_popularity(size, rng):
+    """Вероятности выбора объектов с «длинным хвостом» популярности."""
+    weights = 1 / np.arange(1, size + 1) ** POPULARITY_EXPONENT
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def sample_popular(rng, ids, probabilities, size, exclude=None):
+    """Выборка без повторов с учетом популярности."""
+    if exclude is not None:
+        mask = ids != exclude
+        ids, probabilities = ids[mask], probabilities[mask]
+        probabilities = probabilities / probabilities.sum()
+    size = min(size, len(ids))
+    return ids[rng.choice(len(ids), size, replace=False, p=probabilities)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетических пользователей, подписки, рецепты '
+        'с ингредиентами из ingredients.json, избранное и корзины '
+        'для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--subscriptions', type=int, default=20,
+            help='Подписок на пользователя.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=30,
+            help='Рецептов в избранном у пользователя.'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Рецептов в корзине у пользователя.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--random-seed', type=int, default=0,
+            help='Зерно генератора, чтобы повторять один и тот же набор.'
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить ранее созданные синтетические данные.'
+        )
+
+    def _report(self, name, count, started):
+        self.stdout.write(
+            f'{name}: {count} ({time.perf_counter() - started:.1f} с)'
+        )
+
+    def _batches(self, items, batch_size):
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+
+    def _ensure_ingredients(self):
+        if not Ingredient.objects.exists():
+            importer = IngredientImporter()
+            importer.run(iter_records(
+                os.path.join(JSON_FILES_DIR, 'ingredients.json'),
+                importer.fieldnames
+            ))
+        return np.array(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _ensure_tags(self):
+        for name, slug in SYNTHETIC_TAGS:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+        return np.array(
+            Tag.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _create_users(self, count, batch_size):
+        started = time.perf_counter()
+        offset = User.objects.filter(
+            email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}'
+        ).count()
+        password = make_password(SYNTHETIC_PASSWORD)
+        emails = []
+        for batch in self._batches(range(offset, offset + count), batch_size):
+            users = [
+                User(
+                    email=f'user{number}@{SYNTHETIC_EMAIL_DOMAIN}',
+                    username=f'synthetic{number}',
+                    first_name='Синтетический',
+                    last_name=f'Пользователь {number}',
+                    password=password,
+                )
+                for number in batch
+            ]
+            User.objects.bulk_create(users)
+            emails.extend(user.email for user in users)
+        self._report('Пользователи', count, started)
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем.
+        return np.array(User.objects.filter(
+            email__in=emails
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def _create_subscriptions(self, rng, user_ids, per_user, batch_size):
+        started = time.perf_counter()
+        popularity = get_popularity(len(user_ids), rng)
+        subscriptions = [
+            Subscription(subscriber_id=subscriber_id, author_id=author_id)
+            for subscriber_id in user_ids.tolist()
+            for author_id in sample_popular(
+                rng, user_ids, popularity, per_user, exclude=subscriber_id
+            ).tolist()
+        ]
+        Subscription.objects.bulk_create(
+            subscriptions, batch_size=batch_size, ignore_conflicts=True
+        )
+        self._report('Подписки', len(subscriptions), started)
+
+    def _create_recipes(self, rng, count, user_ids, ingredient_ids, tag_ids,
+                        words, batch_size):
+        started = time.perf_counter()
+        popularity = get_popularity(len(user_ids), rng)
+        recipe_ids = []
+        for batch in self._batches(range(count), batch_size):
+            authors = rng.choice(user_ids, len(batch), p=popularity).tolist()
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create([
+                    Recipe(
+                        author_id=author_id,
+                        name=' '.join(
+                            rng.choice(words, WORDS_IN_NAME).tolist()
+                        ).capitalize(),
+                        text=' '.join(
+                            rng.choice(words, WORDS_IN_TEXT).tolist()
+                        ),
+                        cooking_time=int(rng.integers(5, 181)),
+                        image=SYNTHETIC_IMAGE,
+                    )
+                    for author_id in authors
+                ])
+                if not recipes[0].pk:
+                    recipes = Recipe.objects.filter(
+                        image=SYNTHETIC_IMAGE
+                    ).order_by('-pk')[:len(recipes)]
+                batch_ids = [recipe.pk for recipe in recipes]
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=int(rng.integers(1, 1001)),
+                    )
+                    for recipe_id in batch_ids
+                    for ingredient_id in rng.choice(
+                        ingredient_ids,
+                        min(
+                            int(rng.integers(
+                                MIN_INGREDIENTS, MAX_INGREDIENTS + 1
+                            )),
+                            len(ingredient_ids)
+                        ),
+                        replace=False
+                    ).tolist()
+                ])
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in batch_ids
+                    for tag_id in rng.choice(
+                        tag_ids,
+                        int(rng.integers(1, min(MAX_TAGS, len(tag_ids)) + 1)),
+                        replace=False
+                    ).tolist()
+                ])
+            recipe_ids.extend(batch_ids)
+            self._report('Рецепты', len(recipe_ids), started)
+        return np.array(sorted(recipe_ids))
+
+    def _create_user_recipes(self, rng, model, user_ids, recipe_ids,
+                             per_user, batch_size):
+        started = time.perf_counter()
+        popularity = get_popularity(len(recipe_ids), rng)
+        objects = [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids.tolist()
+            for recipe_id in sample_popular(
+                rng, recipe_ids, popularity, per_user
+            ).tolist()
+        ]
+        model.objects.bulk_create(
+            objects, batch_size=batch_size, ignore_conflicts=True
+        )
+        self._report(model._meta.verbose_name_plural, len(objects), started)
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = User.objects.filter(
+                email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}'
+            ).delete()
+            self.stdout.write(f'Удалено объектов: {deleted}')
+            call_command('recount_counters', stdout=self.stdout)
+            bump_versions(RECIPES_VERSION_KEY, RECIPE_TAGS_VERSION_KEY)
+            return
+        rng = np.random.default_rng(options['random_seed'])
+        batch_size = options['batch_size']
+        ingredient_ids = self._ensure_ingredients()
+        tag_ids = self._ensure_tags()
+        words = np.array(sorted({
+            word
+            for name in Ingredient.objects.values_list('name', flat=True)
+            for word in name.split() if len(word) > 3
+        }))
+
+        user_ids = self._create_users(options['users'], batch_size)
+        if len(user_ids) < 2:
+            self.stderr.write('Нужно хотя бы два пользователя.')
+            return
+        self._create_subscriptions(
+            rng, user_ids, options['subscriptions'], batch_size
+        )
+        recipe_ids = self._create_recipes(
+            rng, options['recipes'], user_ids, ingredient_ids, tag_ids,
+            words, batch_size
+        )
+        if len(recipe_ids):
+            self._create_user_recipes(
+                rng, Favorite, user_ids, recipe_ids, options['favorites'],
+                batch_size
+            )
+            self._create_user_recipes(
+                rng, ShoppingCart, user_ids, recipe_ids, options['cart'],
+                batch_size
+            )
+
+        # bulk_create не отправляет сигналы: счетчики, поисковые векторы,
+        # списки покупок и версии обновляются после вставки.
+        started = time.perf_counter()
+        call_command('recount_counters', stdout=self.stdout)
+        update_search_vectors(recipe_ids.tolist())
+        for batch in self._batches(user_ids.tolist(), batch_size):
+            refresh_shopping_lists(batch)
+        bump_versions(RECIPES_VERSION_KEY, RECIPE_TAGS_VERSION_KEY)
+        self._report('Пересчет производных данных', len(recipe_ids), started)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.importers import DEFAULT_BATCH_SIZE, IMPORTERS, iter_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует ингредиенты, теги или рецепты из файла '
+        'JSON, JSONL или CSV. Повторный запуск не создает дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', dest='file_format', choices=('json', 'jsonl', 'csv'),
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество записей в одной транзакции.'
+        )
+
+    def _report(self, total, seconds):
+        rate = total / seconds if seconds else total
+        self.stdout.write(
+            f'Обработано записей: {total} ({rate:.0f} записей/с)'
+        )
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](
+            batch_size=options['batch_size'],
+            on_progress=self._report
+        )
+        records = iter_records(
+            options['path'], importer.fieldnames, options['file_format']
+        )
+        try:
+            total, seconds = importer.run(records)
+        except FileNotFoundError:
+            raise CommandError(f'Файл {options["path"]} не найден!')
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Ошибка в данных: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: {total} записей за {seconds:.2f} с'
+        ))
+        if importer.skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено записей без автора: {importer.skipped}'
+            ))
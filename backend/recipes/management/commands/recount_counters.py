@@ -0,0 +1,30 @@
+from core.counters import recount_counter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Subscription
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Tag, 'recipes_count', Recipe.tags.through, 'tag'),
+    (Ingredient, 'recipes_count', RecipeIngredient, 'ingredient'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и исправляет расхождения.'
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            with transaction.atomic():
+                fixed = recount_counter(
+                    model, field, related_model, related_field
+                )
+            self.stdout.write(
+                f'{model.__name__}.{field}: исправлено строк - {fixed}'
+            )
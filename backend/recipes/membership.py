@@ -0,0 +1,161 @@
+"""
+Избранное, корзина и подписки текущего пользователя в виде множеств id.
+
+Множества загружаются одним запросом на запрос к API, хранятся в кэше
+под версией membership_version_key пользователя и заменяют запросы
+EXISTS для каждого сериализуемого рецепта или пользователя. Версию
+меняют сигналы, массовые операции избранного, корзины и подписок
+и запись изменений в журнал отложенной записи, поэтому кэш не нужно
+очищать вручную. Изменения, ожидающие отложенной записи
+(recipes.write_behind), накладываются на множества поверх кэша.
+"""
+
+from core.conditional import (bump_versions, get_versions,
+                              membership_version_key)
+from core.db_router import use_primary_if_changed_since
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+from users.models import Subscription
+
+from .models import Favorite, ShoppingCart
+from .write_behind import (FAVORITES, SHOPPING_CART, SUBSCRIPTIONS,
+                           enqueue_mutations, get_pending_mutations)
+
+MEMBERSHIP_CACHE_PREFIX = 'membership_sets:'
+REQUEST_ATTRIBUTE = '_membership'
+
+
+class Membership:
+    """Множества id рецептов в избранном и корзине и id авторов."""
+
+    __slots__ = ('favorites', 'shopping_cart', 'subscriptions')
+
+    def __init__(self, favorites=(), shopping_cart=(), subscriptions=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.subscriptions = frozenset(subscriptions)
+
+    def has(self, kind, object_id):
+        """Есть ли object_id во множестве FAVORITES, SHOPPING_CART
+        или SUBSCRIPTIONS."""
+        return object_id in getattr(self, self.__slots__[kind])
+
+
+EMPTY_MEMBERSHIP = Membership()
+
+
+def load_membership(user_id):
+    """Читает три множества одним запросом UNION ALL."""
+    def kind(value):
+        return Value(value, output_field=IntegerField())
+
+    rows = Favorite.objects.filter(user_id=user_id).order_by().values_list(
+        'recipe_id', kind(FAVORITES)
+    ).union(
+        ShoppingCart.objects.filter(user_id=user_id).order_by().values_list(
+            'recipe_id', kind(SHOPPING_CART)
+        ),
+        Subscription.objects.filter(
+            subscriber_id=user_id
+        ).order_by().values_list('author_id', kind(SUBSCRIPTIONS)),
+        all=True
+    )
+    ids = ([], [], [])
+    for object_id, object_kind in rows:
+        ids[object_kind].append(object_id)
+    # Отсортированные кортежи занимают в кэше меньше места, чем множества.
+    return tuple(tuple(sorted(kind_ids)) for kind_ids in ids)
+
+
+def apply_pending(data, pending):
+    """Накладывает ожидающие изменения на множества из БД."""
+    if not pending:
+        return data
+    sets = [set(ids) for ids in data]
+    for kind, object_id, added in pending:
+        if added:
+            sets[kind].add(object_id)
+        else:
+            sets[kind].discard(object_id)
+    return sets
+
+
+def get_user_membership(user):
+    """Множества пользователя из кэша или из БД."""
+    if not user.is_authenticated:
+        return EMPTY_MEMBERSHIP
+    # Журнал читается первым: поток удаляет изменение из журнала после
+    # смены версии, поэтому оно есть либо в журнале, либо в множествах.
+    pending = get_pending_mutations(user.pk)
+    if not settings.MEMBERSHIP_CACHE_TTL:
+        return Membership(*apply_pending(load_membership(user.pk), pending))
+    # Версия читается до БД: изменение, зафиксированное после чтения,
+    # сменит версию, и устаревшие множества больше не будут прочитаны.
+    (version, changed), = get_versions((membership_version_key(user.pk),))
+    # Свежее изменение, например примененное журналом отложенной
+    # записи, реплика может еще не иметь.
+    use_primary_if_changed_since(changed)
+    key = f'{MEMBERSHIP_CACHE_PREFIX}{user.pk}:{version}'
+    data = cache.get(key)
+    if data is None:
+        data = load_membership(user.pk)
+        cache.set(key, data, settings.MEMBERSHIP_CACHE_TTL)
+    return Membership(*apply_pending(data, pending))
+
+
+def get_membership(context):
+    """
+    Множества текущего пользователя из контекста сериализатора.
+    Загружаются один раз за запрос.
+    """
+    request = context.get('request')
+    if request is None:
+        return EMPTY_MEMBERSHIP
+    membership = getattr(request, REQUEST_ATTRIBUTE, None)
+    if membership is None:
+        membership = get_user_membership(request.user)
+        setattr(request, REQUEST_ATTRIBUTE, membership)
+    return membership
+
+
+def enqueue_membership_changes(request, kind, changes):
+    """
+    Записывает изменения (object_id, added) в журнал отложенной записи
+    вместо БД.
+
+    Возвращает для каждого изменения, меняет ли оно связь с учетом
+    ожидающих и предыдущих изменений: добавление существующей или
+    удаление отсутствующей связи в журнал не попадает.
+    """
+    ids = set(getattr(
+        get_membership({'request': request}), Membership.__slots__[kind]
+    ))
+    results, accepted = [], []
+    for object_id, added in changes:
+        changed = (object_id in ids) != added
+        if changed:
+            accepted.append((object_id, added))
+            if added:
+                ids.add(object_id)
+            else:
+                ids.discard(object_id)
+        results.append(changed)
+    enqueue_mutations(kind, request.user.pk, accepted)
+    if accepted:
+        # Ответы с is_favorited и подобными полями меняются уже сейчас,
+        # а не после применения журнала, поэтому выданные ETag устарели.
+        bump_versions(membership_version_key(request.user.pk))
+    # Ответ этого же запроса должен увидеть изменения.
+    setattr(request, REQUEST_ATTRIBUTE, None)
+    return results
+
+
+def enqueue_membership_change(request, kind, object_id, added):
+    """
+    Записывает одно изменение в журнал. Возвращает False, если с учетом
+    ожидающих изменений связь уже есть (added) или ее уже нет.
+    """
+    return enqueue_membership_changes(
+        request, kind, ((object_id, added),)
+    )[0]
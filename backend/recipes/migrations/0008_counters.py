@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:03
+
+from core.counters import recount_counter
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = (
+        (Recipe, 'favorites_count', apps.get_model('recipes', 'Favorite'),
+         'recipe'),
+        (apps.get_model('recipes', 'Tag'), 'recipes_count',
+         Recipe.tags.through, 'tag'),
+        (apps.get_model('recipes', 'Ingredient'), 'recipes_count',
+         apps.get_model('recipes', 'RecipeIngredient'), 'ingredient'),
+        (apps.get_model('users', 'User'), 'recipes_count', Recipe, 'author'),
+        (apps.get_model('users', 'User'), 'subscribers_count',
+         apps.get_model('users', 'Subscription'), 'author'),
+    )
+    for model, field, related_model, related_field in counters:
+        recount_counter(model, field, related_model, related_field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_name_pattern_index'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Используется в рецептах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов с тегом'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
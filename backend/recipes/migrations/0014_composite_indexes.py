@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+TAGS_INDEX_NAME = 'recipe_tags_tag_recipe_idx'
+
+
+def create_tags_index(apps, schema_editor):
+    # Автоматическая таблица ManyToMany не поддерживает Meta.indexes.
+    # Индекс (tag_id, recipe_id) покрывает фильтр по тегам без обращения
+    # к строкам таблицы.
+    table = apps.get_model('recipes', 'Recipe').tags.through._meta.db_table
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {quote(TAGS_INDEX_NAME)} '
+        f'ON {quote(table)} ({quote("tag_id")}, {quote("recipe_id")})'
+    )
+
+
+def drop_tags_index(apps, schema_editor):
+    schema_editor.execute(
+        f'DROP INDEX IF EXISTS {schema_editor.quote_name(TAGS_INDEX_NAME)}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_neighbor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', '-created_at'], name='shoppingcart_user_created_idx'),
+        ),
+        migrations.RunPython(create_tags_index, drop_tags_index),
+    ]
@@ -1,12 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Prefetch
 
 from .constants import (INGREDIENT_NAME_MAX_LENGTH, MAX_AMOUNT,
                         MAX_COOKING_TIME, MEASUREMENT_UNIT_MAX_LENGTH,
                         MIN_AMOUNT, MIN_COOKING_TIME, RECIPE_NAME_MAX_LENGTH,
-                        TAG_NAME_MAX_LENGTH, TAG_SLUG_MAX_LENGTH,
-                        TEXT_TRUNCATION)
+                        SHORT_LINK_CODE_MAX_LENGTH, TAG_NAME_MAX_LENGTH,
+                        TAG_SLUG_MAX_LENGTH, TEXT_TRUNCATION)
 
 User = get_user_model()
 
@@ -22,6 +24,11 @@ class Tag(models.Model):
         unique=True,
         verbose_name='Слаг'
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов с тегом',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['name']
@@ -41,6 +48,11 @@ class Ingredient(models.Model):
         max_length=MEASUREMENT_UNIT_MAX_LENGTH,
         verbose_name='Единица измерения'
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Используется в рецептах',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -52,6 +64,22 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'[:TEXT_TRUNCATION]
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов с подготовкой данных для сериализации."""
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты фиксированным числом
+        запросов, независимо от количества рецептов. Признаки избранного,
+        корзины и подписки сериализаторы берут из recipes.membership."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(Tag, verbose_name='Теги')
     author = models.ForeignKey(
@@ -74,6 +102,12 @@ class Recipe(models.Model):
         verbose_name='Ссылка на картинку на сайте',
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(verbose_name='Описание')
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления (в минутах)',
@@ -90,12 +124,34 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created_at',)
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(
+                fields=('-created_at', '-id'),
+                name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-created_at', '-id'),
+                name='recipe_author_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name[:TEXT_TRUNCATION]
@@ -153,6 +209,14 @@ class UserRecipe(models.Model):
                 name='unique_%(class)s'
             ),
         )
+        # Ограничение начинается с recipe и не подходит для выборок
+        # по пользователю: фильтров is_favorited/is_in_shopping_cart.
+        indexes = (
+            models.Index(
+                fields=('user', '-created_at'),
+                name='%(class)s_user_created_idx'
+            ),
+        )
 
 
 class Favorite(UserRecipe):
@@ -173,3 +237,109 @@ class ShoppingCart(UserRecipe):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок {self.user}'[:TEXT_TRUNCATION]
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сумма ингредиента в списке покупок пользователя.
+
+    Строки пересчитываются из ShoppingCart и RecipeIngredient при их
+    изменении, поэтому список читается без соединений и группировки.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        default_related_name = 'shopping_list_items'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} у {self.user}'[:TEXT_TRUNCATION]
+
+
+class RecipeNeighbor(models.Model):
+    """
+    Похожий рецепт и оценка сходства.
+
+    Таблицу заполняет команда build_recommendations, похожие рецепты
+    читаются по индексу (recipe, -score) без соединений по избранному
+    и ингредиентам.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Рецепт'
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbor_of',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('-score',)
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='recipe_neighbor_score_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.neighbor} похож на {self.recipe}'[:TEXT_TRUNCATION]
+
+
+class ShortLink(models.Model):
+    """Короткая ссылка на рецепт с base62-кодом и счетчиком переходов."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=SHORT_LINK_CODE_MAX_LENGTH,
+        unique=True,
+        verbose_name='Код'
+    )
+    clicks = models.PositiveIntegerField(
+        verbose_name='Переходов',
+        default=0,
+        editable=False
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return self.code
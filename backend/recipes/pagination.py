@@ -1,6 +1,11 @@
+from core.pagination import OptionalKeysetPagination
 from rest_framework.pagination import PageNumberPagination
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
+
+
+class RecipePagination(OptionalKeysetPagination):
+    keyset_ordering = ('-created_at', '-id')
@@ -0,0 +1,202 @@
+"""
+Похожие рецепты и рекомендации.
+
+Сходство рецептов считается офлайн командой build_recommendations:
+каждый рецепт описывается двумя разреженными векторами с единичной
+нормой - ингредиентами (с весом IDF) и пользователями, добавившими его
+в избранное или корзину. Скалярное произведение векторов дает
+косинусную близость по составу и по совместному избранному. Для каждого
+рецепта сохраняются top-K соседей, и API читает их одним запросом
+по индексу.
+"""
+
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from scipy import sparse
+
+from .constants import (RECOMMENDATIONS_BLOCK_SIZE,
+                        RECOMMENDATIONS_CART_WEIGHT,
+                        RECOMMENDATIONS_CO_FAVORITE_WEIGHT,
+                        RECOMMENDATIONS_INGREDIENT_WEIGHT,
+                        RECOMMENDATIONS_TOP_K)
+from .models import (Favorite, Recipe, RecipeIngredient, RecipeNeighbor,
+                     ShoppingCart)
+
+BULK_CREATE_BATCH_SIZE = 5000
+
+
+def build_matrix(recipe_index, recipe_ids, column_ids, weights=None):
+    """
+    Разреженная матрица рецепт x признак из пар (recipe_id, column_id).
+    Повторяющиеся пары суммируются.
+    """
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    columns, column_index = np.unique(
+        np.asarray(column_ids, dtype=np.int64), return_inverse=True
+    )
+    rows = np.searchsorted(recipe_index, recipe_ids)
+    if weights is None:
+        weights = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix(
+        (weights, (rows, column_index)),
+        shape=(len(recipe_index), len(columns)),
+        dtype=np.float32
+    )
+
+
+def normalize_rows(matrix):
+    """Делит строки на их L2-норму; нулевые строки остаются нулевыми."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def get_ingredient_vectors(recipe_index):
+    """Ингредиенты рецептов с весом IDF: соль и вода почти не влияют."""
+    pairs = np.array(
+        RecipeIngredient.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    matrix = build_matrix(recipe_index, pairs[:, 0], pairs[:, 1])
+    document_frequency = np.bincount(
+        matrix.indices, minlength=matrix.shape[1]
+    )
+    idf = np.log(
+        (1 + len(recipe_index)) / (1 + document_frequency)
+    ).astype(np.float32) + 1
+    return normalize_rows(matrix.dot(sparse.diags(idf)))
+
+
+def get_user_vectors(recipe_index):
+    """
+    Пользователи, отметившие рецепт: избранное с весом 1, корзина
+    с весом RECOMMENDATIONS_CART_WEIGHT.
+    """
+    pairs = []
+    weights = []
+    for model, weight in (
+        (Favorite, 1),
+        (ShoppingCart, RECOMMENDATIONS_CART_WEIGHT),
+    ):
+        model_pairs = np.array(
+            model.objects.order_by().values_list('recipe_id', 'user_id'),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        pairs.append(model_pairs)
+        weights.append(np.full(len(model_pairs), weight, dtype=np.float32))
+    pairs = np.concatenate(pairs)
+    return normalize_rows(build_matrix(
+        recipe_index, pairs[:, 0], pairs[:, 1], np.concatenate(weights)
+    ))
+
+
+def iter_neighbors(top_k=RECOMMENDATIONS_TOP_K,
+                   block_size=RECOMMENDATIONS_BLOCK_SIZE):
+    """
+    Возвращает тройки (recipe_id, neighbor_id, score) с top_k соседями
+    каждого рецепта.
+
+    Сходство считается блоками по block_size рецептов, поэтому память
+    ограничена матрицей block_size x число рецептов.
+    """
+    recipe_index = np.array(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True),
+        dtype=np.int64
+    )
+    size = len(recipe_index)
+    top_k = min(top_k, size - 1)
+    if top_k < 1:
+        return
+    features = [
+        (RECOMMENDATIONS_INGREDIENT_WEIGHT,
+         get_ingredient_vectors(recipe_index)),
+        (RECOMMENDATIONS_CO_FAVORITE_WEIGHT,
+         get_user_vectors(recipe_index)),
+    ]
+    transposed = [
+        (weight, vectors, vectors.T.tocsc()) for weight, vectors in features
+    ]
+    for start in range(0, size, block_size):
+        stop = min(start + block_size, size)
+        scores = np.zeros((stop - start, size), dtype=np.float32)
+        for weight, vectors, vectors_t in transposed:
+            scores += weight * vectors[start:stop].dot(vectors_t).toarray()
+        # Рецепт не должен оказаться похожим сам на себя.
+        scores[np.arange(stop - start), np.arange(start, stop)] = 0
+        columns = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        values = np.take_along_axis(scores, columns, axis=1)
+        order = np.argsort(-values, axis=1)
+        columns = np.take_along_axis(columns, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        for row, (row_columns, row_values) in enumerate(
+            zip(columns, values), start
+        ):
+            for column, value in zip(row_columns, row_values):
+                if value <= 0:
+                    break
+                yield (
+                    int(recipe_index[row]),
+                    int(recipe_index[column]),
+                    float(value)
+                )
+
+
+def build_recommendations(top_k=RECOMMENDATIONS_TOP_K,
+                          block_size=RECOMMENDATIONS_BLOCK_SIZE):
+    """
+    Пересчитывает таблицу похожих рецептов и возвращает число строк.
+
+    Таблица заменяется целиком в одной транзакции, поэтому читатели
+    видят либо старых, либо новых соседей. Соседи записываются пачками
+    по мере расчета и не копятся в памяти.
+    """
+    neighbors = iter_neighbors(top_k, block_size)
+    count = 0
+    with transaction.atomic():
+        RecipeNeighbor.objects.all().delete()
+        while True:
+            batch = [
+                RecipeNeighbor(recipe_id=recipe_id, neighbor_id=neighbor_id,
+                               score=score)
+                for recipe_id, neighbor_id, score in islice(
+                    neighbors, BULK_CREATE_BATCH_SIZE
+                )
+            ]
+            if not batch:
+                return count
+            RecipeNeighbor.objects.bulk_create(batch)
+            count += len(batch)
+
+
+def get_similar_recipes(queryset, recipe):
+    """Соседи рецепта в порядке убывания сходства."""
+    return queryset.filter(neighbor_of__recipe=recipe).annotate(
+        similarity=Sum('neighbor_of__score')
+    ).order_by('-similarity', '-pk')
+
+
+def get_popular_recipes(queryset):
+    return queryset.order_by('-favorites_count', '-created_at', '-pk')
+
+
+def get_recommended_recipes(queryset, membership):
+    """
+    Рецепты, похожие на избранное и корзину пользователя, кроме уже
+    добавленных туда; без отметок - самые популярные рецепты.
+
+    Отметки берутся из множеств пользователя (recipes.membership),
+    которые запрос все равно загружает для флагов.
+    """
+    marked = sorted(membership.favorites | membership.shopping_cart)
+    if not marked:
+        return get_popular_recipes(queryset)
+    return queryset.filter(neighbor_of__recipe__in=marked).exclude(
+        pk__in=marked
+    ).annotate(
+        recommendation_score=Sum('neighbor_of__score')
+    ).order_by('-recommendation_score', '-pk')
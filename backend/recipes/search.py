@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск рецептов."""
+
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from core.conditional import (INGREDIENTS_VERSION_KEY, RECIPES_VERSION_KEY,
+                              get_versions)
+from core.db_router import primary_reads
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, When
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_RESULTS = 1000
+NAME_WEIGHT = 1.0
+INGREDIENTS_WEIGHT = 0.4
+TEXT_WEIGHT = 0.2
+TOKEN_RE = re.compile(r'\w+')
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+
+# Название весит больше ингредиентов, ингредиенты - больше описания.
+UPDATE_SEARCH_VECTOR_SQL = """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector(%(config)s, recipe.name), 'A')
+        || setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s, recipe.text), 'C')
+"""
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids=None):
+    """Пересчитывает поисковые векторы одним запросом в PostgreSQL."""
+    if not is_postgresql():
+        return
+    sql = UPDATE_SEARCH_VECTOR_SQL
+    params = {'config': SEARCH_CONFIG}
+    if recipe_ids is not None:
+        sql += ' WHERE recipe.id = ANY(%(ids)s)'
+        params['ids'] = list(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+class RecipeSearchIndex:
+    """
+    Инвертированный индекс рецептов в памяти для баз без полнотекстового
+    поиска (SQLite).
+
+    Слова запроса сопоставляются с началом слов рецепта, что отчасти
+    заменяет стемминг. Индекс перестраивается при смене версий рецептов
+    и ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Версии и данные индекса заменяются одним присваиванием, чтобы
+        # запрос во время перестройки не смешал новые токены со старыми
+        # списками рецептов.
+        self._index = (None, [], {})
+
+    def _build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        for recipe_id, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).order_by():
+            for token in tokenize(name):
+                postings[token][recipe_id] += NAME_WEIGHT
+            for token in tokenize(text):
+                postings[token][recipe_id] += TEXT_WEIGHT
+        for recipe_id, name in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).order_by():
+            for token in tokenize(name):
+                postings[token][recipe_id] += INGREDIENTS_WEIGHT
+        return sorted(postings), {
+            token: dict(scores) for token, scores in postings.items()
+        }
+
+    def _get_data(self):
+        versions = get_versions(
+            (RECIPES_VERSION_KEY, INGREDIENTS_VERSION_KEY)
+        )
+        index = self._index
+        if index[0] != versions:
+            with self._lock:
+                index = self._index
+                if index[0] != versions:
+                    # Индекс переживает запрос, поэтому не строится
+                    # по реплике.
+                    with primary_reads():
+                        tokens, postings = self._build()
+                    index = self._index = (versions, tokens, postings)
+        return index[1], index[2]
+
+    def _match_term(self, tokens, postings, term):
+        scores = defaultdict(float)
+        start = bisect_left(tokens, term)
+        end = bisect_left(tokens, term + PREFIX_UPPER_BOUND, lo=start)
+        for token in tokens[start:end]:
+            for recipe_id, score in postings[token].items():
+                scores[recipe_id] += score
+        return scores
+
+    def search(self, text, limit=SEARCH_MAX_RESULTS):
+        """Возвращает id рецептов, содержащих все слова, по убыванию ранга."""
+        terms = tokenize(text)
+        if not terms:
+            return []
+        tokens, postings = self._get_data()
+        total = None
+        for term in terms:
+            scores = self._match_term(tokens, postings, term)
+            if total is None:
+                total = scores
+            else:
+                total = {
+                    recipe_id: score + scores[recipe_id]
+                    for recipe_id, score in total.items()
+                    if recipe_id in scores
+                }
+            if not total:
+                return []
+        ranked = sorted(total.items(), key=lambda item: (-item[1], -item[0]))
+        return [recipe_id for recipe_id, _ in ranked[:limit]]
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, text):
+    """
+    Фильтрует рецепты по поисковому запросу и сортирует по релевантности.
+
+    В PostgreSQL используется сохраненный search_vector с GIN-индексом,
+    в остальных базах - индекс в памяти процесса.
+    """
+    if not text.strip():
+        return queryset
+    if is_postgresql():
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-created_at')
+    recipe_ids = recipe_search_index.search(text)
+    if not recipe_ids:
+        return queryset.none()
+    return queryset.filter(pk__in=recipe_ids).order_by(Case(
+        *[When(pk=pk, then=position)
+          for position, pk in enumerate(recipe_ids)],
+        output_field=IntegerField()
+    ))
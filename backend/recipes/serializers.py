@@ -1,25 +1,29 @@
+from core.counters import change_counter
+from core.fields import ImageVariantField, StrippedBase64ImageField
 from django.db import transaction
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import (ModelSerializer, SerializerMethodField,
                                         ValidationError)
 from rest_framework.validators import UniqueTogetherValidator
 from users.serializers import UsersSerializer
 
+from .constants import BULK_RECIPES_MAX_LENGTH
+from .membership import get_membership
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .shopping_list import schedule_recipe_shopping_list_refresh
 
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'slug')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
 
 
 class IngredientAmountSerializer(ModelSerializer):
@@ -42,6 +46,8 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image = ImageVariantField('thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -57,6 +63,7 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
+    image = ImageVariantField(list_variant='medium')
 
     class Meta:
         model = Recipe
@@ -74,20 +81,10 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return (
-            request
-            and request.user.is_authenticated
-            and obj.favorites.filter(user=request.user).exists()
-        )
+        return obj.pk in get_membership(self.context).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        return (
-            request
-            and request.user.is_authenticated
-            and obj.shopping_carts.filter(user=request.user).exists()
-        )
+        return obj.pk in get_membership(self.context).shopping_cart
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -97,7 +94,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True
     )
-    image = Base64ImageField(required=True)
+    image = StrippedBase64ImageField(required=True)
 
     class Meta:
         model = Recipe
@@ -105,13 +102,21 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
 
     def validate(self, data):
-        tags = data.get('tags', [])
+        # При частичном обновлении проверяются только переданные поля:
+        # отсутствующие теги и ингредиенты остаются прежними.
+        if not self.partial or 'tags' in data:
+            self._validate_tags(data.get('tags', []))
+        if not self.partial or 'ingredients' in data:
+            self._validate_ingredients(data.get('ingredients', []))
+        return data
+
+    def _validate_tags(self, tags):
         if not tags:
             raise ValidationError({'tags': 'Необходим хотя бы один тег'})
         if len(tags) != len(set(tags)):
             raise ValidationError({'tags': 'Теги не должны повторяться'})
 
-        ingredients = data.get('ingredients', [])
+    def _validate_ingredients(self, ingredients):
         if not ingredients:
             raise ValidationError(
                 {'ingredients': 'Необходим хотя бы один ингредиент'}
@@ -123,8 +128,6 @@ class RecipeSerializer(serializers.ModelSerializer):
                 {'ingredients': 'Ингредиенты не должны повторяться'}
             )
 
-        return data
-
     def validate_image(self, value):
         if value is None:
             raise serializers.ValidationError('Поле image обязательно')
@@ -138,6 +141,14 @@ class RecipeSerializer(serializers.ModelSerializer):
                 amount=ingredient['amount']
             ) for ingredient in ingredients
         ])
+        # bulk_create не отправляет сигналы, счетчики и списки покупок
+        # обновляются здесь.
+        ingredient_ids = [ingredient['id'].pk for ingredient in ingredients]
+        change_counter(
+            Ingredient.objects.filter(pk__in=ingredient_ids),
+            'recipes_count', 1
+        )
+        schedule_recipe_shopping_list_refresh((recipe.pk,), ingredient_ids)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -149,14 +160,65 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._add_ingredients(recipe, ingredients)
         return recipe
 
+    def _update_tags(self, recipe, tags):
+        """Добавляет и удаляет только изменившиеся теги."""
+        current = set(recipe.tags.values_list('pk', flat=True))
+        wanted = {tag.pk for tag in tags}
+        if current - wanted:
+            recipe.tags.remove(*(current - wanted))
+        if wanted - current:
+            recipe.tags.add(*(wanted - current))
+
+    def _update_ingredients(self, recipe, ingredients):
+        """
+        Сравнивает ингредиенты с сохраненными: новые добавляются,
+        у оставшихся меняется количество, лишние удаляются.
+        """
+        current = {
+            link.ingredient_id: link
+            for link in RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).order_by()
+        }
+        wanted = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            link.pk for ingredient_id, link in current.items()
+            if ingredient_id not in wanted
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, link in current.items():
+            amount = wanted.get(ingredient_id, link.amount)
+            if link.amount != amount:
+                link.amount = amount
+                changed.append(link)
+        if changed:
+            # bulk_update не отправляет сигналы; версию рецепта меняет
+            # сохранение самого рецепта.
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+            schedule_recipe_shopping_list_refresh(
+                (recipe.pk,), [link.ingredient_id for link in changed]
+            )
+        added = [
+            ingredient for ingredient in ingredients
+            if ingredient['id'].pk not in current
+        ]
+        if added:
+            self._add_ingredients(recipe, added)
+
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
         recipe = super().update(instance, validated_data)
-        recipe.tags.set(tags)
-        recipe.ingredients.clear()
-        self._add_ingredients(recipe, ingredients)
+        if tags is not None:
+            self._update_tags(recipe, tags)
+        if ingredients is not None:
+            self._update_ingredients(recipe, ingredients)
 
         return recipe
 
@@ -188,3 +250,44 @@ class FavoriteSerializer(serializers.ModelSerializer):
                 message='Рецепт уже в избранном'
             )
         ]
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=BULK_RECIPES_MAX_LENGTH,
+        required=False,
+        default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=BULK_RECIPES_MAX_LENGTH,
+        required=False,
+        default=list
+    )
+
+    def validate(self, data):
+        add = list(dict.fromkeys(data['add']))
+        remove = list(dict.fromkeys(data['remove']))
+        if not add and not remove:
+            raise serializers.ValidationError(
+                'Укажите рецепты в add или remove'
+            )
+        if set(add) & set(remove):
+            raise serializers.ValidationError(
+                'Рецепт не может быть одновременно в add и remove'
+            )
+        return {'add': add, 'remove': remove}
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
@@ -0,0 +1,101 @@
+"""Материализованный список покупок: суммы ингредиентов по пользователям."""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+
+def get_cart_totals(user_ids, ingredient_ids=None):
+    """Суммы ингредиентов корзин, посчитанные по исходным таблицам."""
+    totals = RecipeIngredient.objects.filter(
+        recipe__shopping_carts__user_id__in=user_ids
+    )
+    if ingredient_ids is not None:
+        totals = totals.filter(ingredient_id__in=ingredient_ids)
+    return {
+        (row['recipe__shopping_carts__user_id'], row['ingredient_id']):
+            row['total_amount']
+        for row in totals.values(
+            'recipe__shopping_carts__user_id', 'ingredient_id'
+        ).annotate(total_amount=Sum('amount')).order_by()
+    }
+
+
+def refresh_shopping_lists(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает строки списков покупок пользователей user_ids.
+
+    Если ingredient_ids задан, затрагиваются только эти ингредиенты.
+    Пересчет идемпотентен, поэтому порядок каскадных удалений и повторные
+    вызовы не влияют на результат.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids or ingredient_ids is not None and not ingredient_ids:
+        return
+    with transaction.atomic():
+        # Блокировка пользователей упорядочивает параллельные пересчеты.
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+        if ingredient_ids is not None:
+            items = items.filter(ingredient_id__in=ingredient_ids)
+        items.delete()
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount
+            )
+            for (user_id, ingredient_id), total_amount
+            in get_cart_totals(user_ids, ingredient_ids).items()
+        ])
+
+
+def schedule_shopping_list_refresh(user_ids, ingredient_ids=None):
+    """Пересчитывает списки покупок после фиксации транзакции."""
+    user_ids = list(user_ids)
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+    if user_ids:
+        transaction.on_commit(
+            lambda: refresh_shopping_lists(user_ids, ingredient_ids)
+        )
+
+
+def schedule_recipe_shopping_list_refresh(recipe_ids, ingredient_ids=None):
+    """Пересчитывает списки покупок всех, у кого рецепты в корзине."""
+    schedule_shopping_list_refresh(
+        ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True).distinct(),
+        ingredient_ids
+    )
+
+
+def find_shopping_list_mismatches(user_ids=None):
+    """
+    Сравнивает сохраненные строки с суммами по исходным таблицам.
+
+    Возвращает {(user_id, ingredient_id): (сохранено, ожидается)}.
+    """
+    if user_ids is None:
+        user_ids = set(ShoppingCart.objects.values_list(
+            'user_id', flat=True
+        )) | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+    expected = get_cart_totals(user_ids)
+    stored = {
+        (user_id, ingredient_id): total_amount
+        for user_id, ingredient_id, total_amount
+        in ShoppingListItem.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        )
+    }
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key) != expected.get(key)
+    }
@@ -0,0 +1,141 @@
+"""
+Короткие ссылки на рецепты.
+
+Код ссылки - случайная base62-строка, хранится в уникальном индексе
+таблицы ShortLink. Переход по ссылке разрешается через LRU в памяти
+процесса, а счетчики переходов копятся в буфере и сбрасываются в БД
+фоновым потоком пачками.
+"""
+
+import atexit
+import logging
+import secrets
+import string
+import threading
+from collections import Counter
+
+from core.lru import LRUCache
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .constants import SHORT_LINK_CODE_LENGTH
+from .models import ShortLink
+
+logger = logging.getLogger('foodgram.short_links')
+
+BASE62_ALPHABET = string.digits + string.ascii_letters
+CODE_ATTEMPTS = 10
+
+short_link_cache = LRUCache(
+    settings.SHORT_LINK_CACHE_SIZE, settings.SHORT_LINK_CACHE_TTL
+)
+
+
+def generate_code(length=SHORT_LINK_CODE_LENGTH):
+    """
+    Случайный base62-код. Коды только из цифр не выдаются: такие пути
+    занимают старые ссылки вида /s/<id рецепта>/.
+    """
+    while True:
+        code = ''.join(
+            secrets.choice(BASE62_ALPHABET) for _ in range(length)
+        )
+        if not code.isdigit():
+            return code
+
+
+def get_or_create_short_link(recipe):
+    """Возвращает короткую ссылку рецепта, создавая ее при первом вызове."""
+    for _ in range(CODE_ATTEMPTS):
+        link = ShortLink.objects.filter(recipe=recipe).first()
+        if link is not None:
+            return link
+        try:
+            with transaction.atomic():
+                return ShortLink.objects.create(
+                    recipe=recipe, code=generate_code()
+                )
+        except IntegrityError:
+            # Совпал код или ссылку параллельно создал другой запрос.
+            continue
+    raise IntegrityError(
+        f'Не удалось создать короткую ссылку для рецепта {recipe.pk}'
+    )
+
+
+def resolve_short_link(code):
+    """Возвращает (id ссылки, id рецепта) по коду или None."""
+    link = short_link_cache.get(code)
+    if link is None:
+        link = ShortLink.objects.filter(code=code).values_list(
+            'pk', 'recipe_id'
+        ).first()
+        if link is None:
+            return None
+        short_link_cache.set(code, link)
+    return link
+
+
+class ClickBuffer:
+    """
+    Копит переходы по ссылкам в памяти процесса и записывает их в БД
+    одной транзакцией раз в interval секунд или при накоплении
+    threshold переходов.
+    """
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._size = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, link_id):
+        with self._lock:
+            self._pending[link_id] += 1
+            self._size += 1
+            full = self._size >= self.threshold
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='short-link-clicks', daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Записывает накопленные переходы и возвращает их число."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._size = 0
+        if not pending:
+            return 0
+        try:
+            with transaction.atomic():
+                for link_id, clicks in sorted(pending.items()):
+                    ShortLink.objects.filter(pk=link_id).update(
+                        clicks=F('clicks') + clicks
+                    )
+        except Exception:
+            logger.exception('Не удалось сохранить переходы по ссылкам')
+            with self._lock:
+                self._pending.update(pending)
+                self._size += sum(pending.values())
+            return 0
+        return sum(pending.values())
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+            connection.close()
+
+
+click_buffer = ClickBuffer(
+    settings.SHORT_LINK_FLUSH_INTERVAL, settings.SHORT_LINK_FLUSH_THRESHOLD
+)
+atexit.register(click_buffer.flush)
@@ -0,0 +1,233 @@
+from core.conditional import (INGREDIENTS_VERSION_KEY, RECIPE_TAGS_VERSION_KEY,
+                              RECIPES_VERSION_KEY, TAGS_VERSION_KEY,
+                              bump_versions, membership_version_key,
+                              recipe_version_key)
+from core.counters import change_counter
+from core.images import schedule_image_processing
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .autocomplete import ingredient_index
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShortLink, Tag)
+from .search import update_search_vectors
+from .shopping_list import (schedule_recipe_shopping_list_refresh,
+                            schedule_shopping_list_refresh)
+from .short_links import short_link_cache
+
+User = get_user_model()
+
+
+def bump_recipe_versions(recipe_ids, tag_feed=False):
+    """
+    Меняет версии рецептов и общей ленты рецептов. tag_feed - рецепты
+    созданы, удалены или сменили теги: тогда меняется и версия индекса
+    тегов.
+    """
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        bump_versions(
+            RECIPES_VERSION_KEY, *map(recipe_version_key, recipe_ids),
+            *((RECIPE_TAGS_VERSION_KEY,) if tag_feed else ())
+        )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Сбрасывает индекс автодополнения при изменении ингредиентов."""
+    ingredient_index.invalidate()
+    bump_versions(INGREDIENTS_VERSION_KEY)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_versions(TAGS_VERSION_KEY)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(sender, instance, signal, created=False, **kwargs):
+    bump_recipe_versions(
+        (instance.pk,), tag_feed=created or signal is post_delete
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_ingredients_version(sender, instance, **kwargs):
+    bump_recipe_versions((instance.recipe_id,))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if reverse and action == 'pre_clear':
+        bump_recipe_versions(
+            instance.recipes.values_list('pk', flat=True), tag_feed=True
+        )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            bump_recipe_versions((instance.pk,), tag_feed=True)
+        elif pk_set:
+            bump_recipe_versions(pk_set, tag_feed=True)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def bump_user_recipe_version(sender, instance, **kwargs):
+    bump_versions(membership_version_key(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def bump_author_recipes_version(sender, instance, created, update_fields,
+                                **kwargs):
+    """Автор входит в представление рецепта, кроме даты входа."""
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    bump_recipe_versions(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_author_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def decrement_recipe_counters(sender, instance, **kwargs):
+    """Связи с тегами удаляются каскадом без сигналов m2m_changed."""
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+    change_counter(instance.tags.all(), 'recipes_count', -1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def increment_ingredient_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Ingredient.objects.filter(pk=instance.ingredient_id),
+            'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def decrement_ingredient_recipes_count(sender, instance, **kwargs):
+    change_counter(
+        Ingredient.objects.filter(pk=instance.ingredient_id),
+        'recipes_count', -1
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def change_tag_recipes_count(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            change_counter(
+                Tag.objects.filter(pk=instance.pk),
+                'recipes_count', -instance.recipes.count()
+            )
+        else:
+            change_counter(instance.tags.all(), 'recipes_count', -1)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        change_counter(
+            Tag.objects.filter(pk=instance.pk),
+            'recipes_count', delta * len(pk_set)
+        )
+    else:
+        change_counter(
+            Tag.objects.filter(pk__in=pk_set), 'recipes_count', delta
+        )
+
+
+def schedule_search_vector_update(recipe_ids):
+    """Обновляет поисковые векторы после записи ингредиентов рецепта."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    schedule_search_vector_update((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def update_recipe_ingredients_search_vector(sender, instance, **kwargs):
+    schedule_search_vector_update((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(sender, instance, created,
+                                            **kwargs):
+    if not created:
+        schedule_search_vector_update(
+            instance.recipes.values_list('pk', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    schedule_image_processing(
+        instance, 'image',
+        on_done=lambda pk: bump_recipe_versions((pk,))
+    )
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def refresh_user_shopping_list(sender, instance, signal, created=False,
+                               **kwargs):
+    if signal is post_save and not created:
+        return
+    schedule_shopping_list_refresh(
+        (instance.user_id,),
+        RecipeIngredient.objects.filter(
+            recipe_id=instance.recipe_id
+        ).values_list('ingredient_id', flat=True)
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def refresh_recipe_ingredient_shopping_lists(sender, instance, **kwargs):
+    schedule_recipe_shopping_list_refresh(
+        (instance.recipe_id,), (instance.ingredient_id,)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def refresh_deleted_recipe_shopping_lists(sender, instance, **kwargs):
+    """При каскадном удалении корзины и ингредиенты удаляются в
+    произвольном порядке, поэтому затронутые строки собираются заранее."""
+    schedule_recipe_shopping_list_refresh(
+        (instance.pk,),
+        instance.recipeingredient_set.values_list('ingredient_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=ShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    """Убирает удаленную ссылку из LRU текущего процесса."""
+    short_link_cache.delete(instance.code)
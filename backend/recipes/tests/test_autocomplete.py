@@ -0,0 +1,39 @@
+from recipes.autocomplete import IngredientPrefixIndex
+from recipes.models import Ingredient
+from rest_framework.test import APITestCase
+
+from .utils import clear_caches, create_catalogue
+
+
+class IngredientPrefixIndexTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue()
+
+    def setUp(self):
+        clear_caches()
+        self.index = IngredientPrefixIndex()
+
+    def names(self, prefix, limit=None):
+        return [item['name'] for item in self.index.search(prefix, limit)]
+
+    def test_search_by_prefix(self):
+        self.assertEqual(self.names('ингредиент 1'), ['Ингредиент 1'])
+        self.assertEqual(len(self.names('ИНГР')), 5)
+        self.assertEqual(self.names('ингр', limit=2),
+                         ['Ингредиент 0', 'Ингредиент 1'])
+        self.assertEqual(self.names('соль'), [])
+
+    def test_rebuild_replaces_keys_and_items_together(self):
+        self.names('ингр')
+        old_index = self.index._index
+        Ingredient.objects.create(name='Абрикос', measurement_unit='г')
+        self.index.invalidate()
+        self.assertEqual(self.names('а'), ['Абрикос'])
+        version, keys, items = self.index._index
+        self.assertIsNot(keys, old_index[1])
+        self.assertEqual(len(keys), len(items))
+        self.assertEqual(
+            list(keys), [item['name'].casefold() for item in items]
+        )
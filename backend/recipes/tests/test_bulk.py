@@ -0,0 +1,102 @@
+from unittest import mock
+
+from core.queries import insert_ignore_conflicts
+from recipes.bulk import (ABSENT, ADDED, EXISTS, NOT_FOUND, REMOVED,
+                          bulk_change_user_recipes)
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from rest_framework.test import APITestCase
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+FAVORITE_BULK_URL = '/api/recipes/favorite/bulk/'
+SHOPPING_CART_BULK_URL = '/api/recipes/shopping_cart/bulk/'
+
+
+class BulkUserRecipesTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.other = create_user(1)
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(4, [cls.other], tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = client_for(self.user)
+
+    def favorites_counts(self):
+        return list(Recipe.objects.order_by('pk').values_list(
+            'favorites_count', flat=True
+        ))
+
+    def test_statuses_and_counters(self):
+        first, second, third, fourth = [recipe.pk for recipe in self.recipes]
+        Favorite.objects.create(user=self.user, recipe_id=second)
+        Favorite.objects.create(user=self.user, recipe_id=fourth)
+        Favorite.objects.create(user=self.other, recipe_id=second)
+        response = self.client.post(FAVORITE_BULK_URL, {
+            'add': [first, second, first, 999],
+            'remove': [fourth, third],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': first, 'status': ADDED},
+            {'id': second, 'status': EXISTS},
+            {'id': 999, 'status': NOT_FOUND},
+            {'id': fourth, 'status': REMOVED},
+            {'id': third, 'status': ABSENT},
+        ])
+        self.assertEqual(
+            set(Favorite.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            {first, second}
+        )
+        self.assertEqual(self.favorites_counts(), [1, 2, 0, 0])
+
+    def test_repeated_request_keeps_counters(self):
+        data = {'add': [recipe.pk for recipe in self.recipes]}
+        for _ in range(2):
+            self.client.post(FAVORITE_BULK_URL, data, format='json')
+        self.assertEqual(self.favorites_counts(), [1, 1, 1, 1])
+        response = self.client.post(
+            FAVORITE_BULK_URL, {'remove': data['add']}, format='json'
+        )
+        self.assertEqual(
+            {result['status'] for result in response.data['results']},
+            {REMOVED}
+        )
+        self.assertEqual(self.favorites_counts(), [0, 0, 0, 0])
+
+    def test_concurrent_insert_not_counted_twice(self):
+        recipe = self.recipes[0]
+        original = insert_ignore_conflicts
+
+        def racing_insert(*args, **kwargs):
+            # Параллельный запрос добавил ту же связь раньше.
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            return original(*args, **kwargs)
+
+        with mock.patch('recipes.bulk.insert_ignore_conflicts', racing_insert):
+            results = bulk_change_user_recipes(
+                self.user, Favorite, add=[recipe.pk],
+                counter_field='favorites_count'
+            )
+        self.assertEqual(results, [{'id': recipe.pk, 'status': EXISTS}])
+        self.assertEqual(self.favorites_counts()[0], 1)
+
+    def test_shopping_cart_refreshes_shopping_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                SHOPPING_CART_BULK_URL,
+                {'add': [self.recipes[0].pk, self.recipes[1].pk]},
+                format='json'
+            )
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(
+            ShoppingListItem.objects.filter(user=self.user).count(), 2
+        )
@@ -0,0 +1,51 @@
+from unittest import mock
+
+from core.conditional import VERSION_CACHE_PREFIX, recipe_version_key
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+
+class ConditionalGetTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        tags, ingredients = create_catalogue()
+        cls.recipe = create_recipes(1, [cls.user], tags, ingredients)[0]
+
+    def setUp(self):
+        clear_caches()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def test_cache_control(self):
+        response = client_for().get(self.url)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        client = client_for(self.user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response['Cache-Control'].split(', ')),
+            {'private', 'no-cache'}
+        )
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
+
+    @override_settings(VERSION_CACHE_TTL=60)
+    def test_missing_object_version_expires(self):
+        key = VERSION_CACHE_PREFIX + recipe_version_key(999)
+        with mock.patch.object(
+            cache, 'set_many', wraps=cache.set_many
+        ) as set_many:
+            response = client_for().get('/api/recipes/999/')
+        self.assertEqual(response.status_code, 404)
+        timeouts = [
+            call.args[1] for call in set_many.call_args_list
+            if key in call.args[0]
+        ]
+        self.assertEqual(timeouts, [60])
@@ -0,0 +1,36 @@
+import io
+
+from core.images import strip_metadata
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+GPS_IFD = 0x8825
+
+
+def make_jpeg(with_gps):
+    image = Image.new('RGB', (8, 4), 'red')
+    buffer = io.BytesIO()
+    if with_gps:
+        exif = Image.Exif()
+        exif[GPS_IFD] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+        exif[0x0112] = 6  # Повернуто на 90 градусов.
+        image.save(buffer, 'JPEG', exif=exif)
+    else:
+        image.save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='photo.jpg')
+
+
+class StripMetadataTest(SimpleTestCase):
+
+    def test_exif_removed_and_orientation_applied(self):
+        stripped = strip_metadata(make_jpeg(with_gps=True))
+        with Image.open(stripped) as image:
+            self.assertFalse(image.getexif())
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(image.size, (4, 8))
+        self.assertEqual(stripped.name, 'photo.jpg')
+
+    def test_clean_image_not_reencoded(self):
+        original = make_jpeg(with_gps=False)
+        self.assertIs(strip_metadata(original), original)
@@ -0,0 +1,51 @@
+from rest_framework.test import APITestCase
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+RECIPES_URL = '/api/recipes/'
+
+
+class KeysetPaginationTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(5, [cls.author], tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+        self.client = client_for()
+
+    def ids(self, response):
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_cursor_pages_feed(self):
+        response = self.client.get(RECIPES_URL, {'cursor': '', 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        ids = self.ids(response)
+        response = self.client.get(response.data['next'])
+        ids += self.ids(response)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            ids, [recipe.pk for recipe in reversed(self.recipes)]
+        )
+
+    def test_cursor_with_search_rejected(self):
+        response = self.client.get(RECIPES_URL, {'search': 'Рецепт 3'})
+        self.assertEqual(response.status_code, 200)
+        ranked = self.ids(response)
+        self.assertEqual(ranked[0], self.recipes[3].pk)
+
+        response = self.client.get(
+            RECIPES_URL, {'search': 'Рецепт 3', 'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
+
+    def test_cursor_with_recommendations_rejected(self):
+        response = self.client.get(
+            f'{RECIPES_URL}recommended/', {'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 400)
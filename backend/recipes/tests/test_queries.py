@@ -0,0 +1,77 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, ShoppingCart
+from rest_framework.test import APITestCase
+from users.models import Subscription
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+PAGE_SIZES = (1, 5, 20)
+
+
+class RecipeFeedQueriesTest(APITestCase):
+    """Число запросов ленты не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        authors = [create_user(index) for index in range(1, 4)]
+        tags, ingredients = create_catalogue()
+        recipes = create_recipes(20, authors, tags, ingredients)
+        for recipe in recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(subscriber=cls.user, author=authors[0])
+
+    def setUp(self):
+        clear_caches()
+
+    def count_queries(self, client, limit):
+        # Первый запрос заполняет кэши токена и множеств пользователя.
+        # Ответы анонимам тоже кэшируются, поэтому кэш ответов после него
+        # очищается.
+        client.get('/api/recipes/', {'limit': limit})
+        caches['responses'].clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, client):
+        counts = {
+            limit: self.count_queries(client, limit) for limit in PAGE_SIZES
+        }
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        return counts[PAGE_SIZES[0]]
+
+    def test_anonymous_feed(self):
+        # COUNT, рецепты с авторами, теги, ингредиенты.
+        self.assertEqual(self.assert_constant_queries(client_for()), 4)
+
+    @override_settings(TOKEN_CACHE_ENABLED=True)
+    def test_authenticated_feed(self):
+        # Токен и множества пользователя берутся из кэша.
+        self.assertEqual(
+            self.assert_constant_queries(client_for(self.user)), 4
+        )
+
+    def test_authenticated_flags(self):
+        response = client_for(self.user).get('/api/recipes/', {'limit': 20})
+        flags = {
+            recipe['id']: (
+                recipe['is_favorited'],
+                recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed']
+            )
+            for recipe in response.data['results']
+        }
+        favorited = set(
+            Favorite.objects.values_list('recipe_id', flat=True)
+        )
+        for recipe_id, (is_favorited, in_cart, _) in flags.items():
+            self.assertEqual(is_favorited, recipe_id in favorited)
+            self.assertEqual(in_cart, recipe_id in favorited)
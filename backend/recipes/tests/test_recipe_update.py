@@ -0,0 +1,96 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, RecipeIngredient
+from rest_framework.test import APITestCase
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+M2M_TABLES = (
+    RecipeIngredient._meta.db_table,
+    Recipe.tags.through._meta.db_table,
+)
+
+
+def m2m_writes(context):
+    """Запросы INSERT/UPDATE/DELETE к ингредиентам и тегам рецепта."""
+    return [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].lstrip().upper().startswith(
+            ('INSERT', 'UPDATE', 'DELETE')
+        )
+        and any(table in query['sql'] for table in M2M_TABLES)
+    ]
+
+
+class RecipeUpdateTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.recipe = create_recipes(
+            3, [cls.author], cls.tags, cls.ingredients
+        )[2]
+
+    def setUp(self):
+        clear_caches()
+        self.client = client_for(self.author)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def links(self):
+        return list(RecipeIngredient.objects.filter(
+            recipe=self.recipe
+        ).order_by('pk').values_list('pk', 'ingredient_id', 'amount'))
+
+    def tag_links(self):
+        return list(Recipe.tags.through.objects.filter(
+            recipe=self.recipe
+        ).order_by('pk').values_list('pk', 'tag_id'))
+
+    def test_text_only_patch_keeps_tags_and_ingredients(self):
+        links, tag_links = self.links(), self.tag_links()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url, {'text': 'Исправленное описание'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['text'], 'Исправленное описание')
+        self.assertEqual(m2m_writes(context), [])
+        self.assertEqual(self.links(), links)
+        self.assertEqual(self.tag_links(), tag_links)
+
+    def test_patch_validates_sent_fields(self):
+        response = self.client.patch(
+            self.url, {'tags': []}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+        ingredient = self.ingredients[0].pk
+        response = self.client.patch(self.url, {'ingredients': [
+            {'id': ingredient, 'amount': 1},
+            {'id': ingredient, 'amount': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+
+    def test_amount_change_updates_one_row(self):
+        links, tag_links = self.links(), self.tag_links()
+        ingredients = [
+            {'id': ingredient_id, 'amount': amount}
+            for _, ingredient_id, amount in links
+        ]
+        ingredients[0]['amount'] += 5
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url, {'ingredients': ingredients}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        writes = m2m_writes(context)
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].lstrip().upper().startswith('UPDATE'))
+        pk, ingredient_id, amount = links[0]
+        self.assertEqual(
+            self.links(), [(pk, ingredient_id, amount + 5)] + links[1:]
+        )
+        self.assertEqual(self.tag_links(), tag_links)
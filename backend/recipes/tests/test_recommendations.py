@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes import recommendations
+from recipes.models import Favorite, RecipeNeighbor
+from rest_framework.test import APITestCase
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+RECOMMENDED_URL = '/api/recipes/recommended/'
+
+
+class RecommendationsTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(8, [cls.author], tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_build_writes_all_neighbors_in_batches(self):
+        expected = list(recommendations.iter_neighbors(top_k=3, block_size=2))
+        with mock.patch.object(recommendations, 'BULK_CREATE_BATCH_SIZE', 4):
+            count = recommendations.build_recommendations(
+                top_k=3, block_size=2
+            )
+        self.assertEqual(count, len(expected))
+        self.assertEqual(
+            sorted(RecipeNeighbor.objects.values_list(
+                'recipe_id', 'neighbor_id'
+            )),
+            sorted((recipe_id, neighbor_id)
+                   for recipe_id, neighbor_id, _ in expected)
+        )
+
+    def test_recommended_excludes_marked_without_exists_query(self):
+        recommendations.build_recommendations(top_k=3)
+        marked = self.recipes[0]
+        Favorite.objects.create(user=self.user, recipe=marked)
+        neighbor_ids = set(RecipeNeighbor.objects.filter(
+            recipe=marked
+        ).values_list('neighbor_id', flat=True))
+        client = client_for(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(RECOMMENDED_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {recipe['id'] for recipe in response.data['results']},
+            neighbor_ids - {marked.pk}
+        )
+        self.assertFalse(any(
+            'EXISTS' in query['sql'].upper()
+            for query in context.captured_queries
+        ))
+
+    def test_popular_without_marks_or_neighbors(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+        for client in (client_for(), client_for(self.user)):
+            response = client.get(RECOMMENDED_URL)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                response.data['count'], len(self.recipes)
+            )
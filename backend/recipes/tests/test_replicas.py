@@ -0,0 +1,119 @@
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+REPLICA = 'replica_0'
+REPLICA_NAME = 'Рецепт с реплики'
+
+
+@override_settings(
+    REPLICA_DATABASES=[REPLICA],
+    DATABASE_ROUTERS=['core.db_router.ReplicaRouter'],
+    MIDDLEWARE=['core.middleware.ProfilingMiddleware', *settings.MIDDLEWARE],
+    PROFILING_TOKEN='secret'
+)
+class ReplicaReadsTest(TransactionTestCase):
+    """
+    Основная БД и реплика - две разные БД SQLite: реплика копируется
+    с основной, и название рецепта в ней меняется, чтобы было видно,
+    откуда прочитан ответ.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Реплика не входит в databases: тестовый раннер не создает для
+        # нее БД, файл копируется перед каждым тестом.
+        cls.directory = tempfile.mkdtemp()
+        connections.settings[REPLICA] = {
+            **connections.settings['default'],
+            'NAME': str(Path(cls.directory) / 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        clear_caches()
+        patcher = mock.patch('recipes.signals.schedule_image_processing')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user(0)
+        tags, ingredients = create_catalogue()
+        self.recipe = create_recipes(1, [create_user(1)], tags, ingredients)[0]
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.copy_to_replica()
+
+    def copy_to_replica(self):
+        connections[REPLICA].close()
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(connections[REPLICA].settings_dict['NAME'])
+        connections['default'].connection.backup(replica)
+        replica.execute(
+            'UPDATE recipes_recipe SET name = ?', (REPLICA_NAME,)
+        )
+        replica.commit()
+        replica.close()
+
+    def lag_passed(self):
+        """Версии данных старше окна отставания реплики."""
+        clock = mock.Mock(time=lambda: time.time() + 60)
+        return mock.patch('core.db_router.time', clock)
+
+    def test_fresh_global_version_read_from_replica_not_cached(self):
+        client = client_for()
+        for _ in range(2):
+            response = client.get(self.url)
+            self.assertEqual(response.data['name'], REPLICA_NAME)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertFalse(response.has_header('ETag'))
+        with self.lag_passed():
+            response = client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(client.get(self.url)['X-Cache'], 'HIT')
+
+    def test_user_pinned_to_primary_after_change(self):
+        client = client_for(self.user)
+        with self.lag_passed():
+            self.assertEqual(
+                client.get(self.url).data['name'], REPLICA_NAME
+            )
+            response = client.post(f'{self.url}favorite/')
+            self.assertEqual(response.status_code, 201)
+            response = client.get(self.url)
+        self.assertEqual(response.data['name'], self.recipe.name)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_fresh_own_membership_read_from_primary(self):
+        # Изменение сделано не запросом пользователя, например журналом
+        # отложенной записи, поэтому пользователь не закреплен.
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = client_for(self.user).get(self.url)
+        self.assertEqual(response.data['name'], REPLICA_NAME)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_profiling_counts_replica_queries(self):
+        client = client_for()
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = client.get('/api/recipes/', HTTP_X_PROFILE='secret')
+        self.assertGreater(len(replica), 0)
+        self.assertIn(
+            f'desc="{len(replica)} queries"', response['Server-Timing']
+        )
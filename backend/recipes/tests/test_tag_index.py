@@ -0,0 +1,66 @@
+from unittest import mock
+
+from recipes.models import Recipe
+from recipes.tag_index import RecipeTagIndex
+from rest_framework.test import APITestCase
+
+from .utils import clear_caches, create_catalogue, create_recipes, create_user
+
+
+class RecipeTagIndexTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags, cls.ingredients = create_catalogue()
+        cls.recipes = create_recipes(
+            3, [cls.author], cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.index = RecipeTagIndex()
+        self.slug = self.tags[0].slug
+        # Фото рецептов в тестах не существуют.
+        patcher = mock.patch('recipes.signals.schedule_image_processing')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ids_with_tag(self):
+        return list(Recipe.objects.filter(
+            tags__slug=self.slug
+        ).order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def count_builds(self, change):
+        self.index.filter([self.slug])
+        build = mock.Mock(wraps=self.index._build)
+        with mock.patch.object(self.index, '_build', build):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertEqual(self.index.filter([self.slug]),
+                             self.ids_with_tag())
+        return build.call_count
+
+    def test_recipe_edit_keeps_index(self):
+        recipe = self.recipes[0]
+
+        def edit():
+            recipe.text = 'Новое описание'
+            recipe.save()
+
+        self.assertEqual(self.count_builds(edit), 0)
+
+    def test_tag_change_rebuilds_index(self):
+        self.assertEqual(self.count_builds(
+            lambda: self.recipes[1].tags.remove(self.tags[0])
+        ), 1)
+
+    def test_new_and_deleted_recipes_rebuild_index(self):
+        def create():
+            Recipe.objects.create(
+                author=self.author, name='Новый', text='Описание',
+                cooking_time=5, image='recipes/test.png'
+            ).tags.add(self.tags[0])
+
+        self.assertEqual(self.count_builds(create), 1)
+        self.assertEqual(self.count_builds(self.recipes[0].delete), 1)
@@ -0,0 +1,97 @@
+import base64
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from core.authentication import (TOKEN_CACHE_PREFIX, get_token_hash,
+                                 local_tokens)
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.models import User
+
+from .utils import clear_caches, client_for, create_user
+
+ME_URL = '/api/users/me/'
+PASSWORD = 'Secret-password-1'
+TOKEN_TABLE = Token._meta.db_table
+
+
+def token_queries(context):
+    return [
+        query for query in context.captured_queries
+        if TOKEN_TABLE in query['sql']
+    ]
+
+
+class TokenCacheTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+
+    def setUp(self):
+        clear_caches()
+        local_tokens.clear()
+        self.client = client_for(self.user)
+
+    @override_settings(TOKEN_CACHE_ENABLED=True)
+    def test_cached_token_revoked_on_logout(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.assertEqual(token_queries(context), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    @override_settings(TOKEN_CACHE_ENABLED=False)
+    def test_disabled_cache_checks_database(self):
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(ME_URL).status_code, 200)
+            self.assertEqual(len(token_queries(context)), 1)
+
+    @override_settings(TOKEN_CACHE_ENABLED=True)
+    def test_cached_user_save_keeps_counters(self):
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+        entry = cache.get(TOKEN_CACHE_PREFIX + get_token_hash(
+            Token.objects.get(user=self.user).key
+        ))
+        self.assertNotIn('password', entry[0][0])
+        self.assertNotIn('subscribers_count', entry[0][0])
+
+        subscriber = client_for(create_user(1))
+        response = subscriber.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+        buffer = BytesIO()
+        Image.new('RGB', (2, 2), 'red').save(buffer, 'PNG')
+        avatar = base64.b64encode(buffer.getvalue()).decode()
+        # Сохранение пользователя меняет версию токена после фиксации.
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media), \
+                mock.patch('users.signals.schedule_image_processing'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                f'{ME_URL}avatar/',
+                {'avatar': f'data:image/png;base64,{avatar}'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD,
+            'new_password': 'Another-password-2',
+        })
+        self.assertEqual(response.status_code, 204, response.data)
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.subscribers_count, 1)
+        self.assertTrue(user.avatar)
+        self.assertTrue(user.check_password('Another-password-2'))
@@ -0,0 +1,160 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from recipes import write_behind
+from recipes.bulk import ABSENT, ADDED, EXISTS, NOT_FOUND
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework.test import APITestCase
+from users.models import Subscription, User
+
+from .utils import (clear_caches, client_for, create_catalogue, create_recipes,
+                    create_user)
+
+COMMAND_MODULE = 'recipes.management.commands.apply_write_behind'
+
+
+class WriteBehindTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.author = create_user(1)
+        tags, ingredients = create_catalogue()
+        cls.recipes = create_recipes(3, [cls.author], tags, ingredients)
+
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = write_behind.MutationLog(Path(directory.name) / 'log')
+        self.worker = write_behind.WriteBehindWorker(self.log, 60, 100)
+        # Журнал применяется явно, без фонового потока.
+        for patcher in (
+            mock.patch.object(self.worker, 'start'),
+            mock.patch.object(write_behind, 'mutation_log', self.log),
+            mock.patch.object(write_behind, 'write_behind_worker',
+                              self.worker),
+            mock.patch(f'{COMMAND_MODULE}.mutation_log', self.log),
+            mock.patch(f'{COMMAND_MODULE}.write_behind_worker', self.worker),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def enqueue_changes(self):
+        first, second, third = [recipe.pk for recipe in self.recipes]
+        Favorite.objects.create(user=self.user, recipe_id=third)
+        Recipe.objects.filter(pk=third).update(favorites_count=1)
+        write_behind.enqueue_mutations(
+            write_behind.FAVORITES, self.user.pk,
+            [(first, True), (second, True), (second, False), (second, True),
+             (third, False)]
+        )
+        write_behind.enqueue_mutations(
+            write_behind.SHOPPING_CART, self.user.pk, [(first, True)]
+        )
+        write_behind.enqueue_mutations(
+            write_behind.SUBSCRIPTIONS, self.user.pk,
+            [(self.author.pk, True), (self.user.pk, True)]
+        )
+
+    def assert_applied(self):
+        first, second, third = [recipe.pk for recipe in self.recipes]
+        self.assertEqual(
+            set(Favorite.objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True
+            )),
+            {first, second}
+        )
+        self.assertEqual(
+            list(Recipe.objects.order_by('pk').values_list(
+                'favorites_count', flat=True
+            )),
+            [1, 1, 0]
+        )
+        self.assertTrue(ShoppingCart.objects.filter(
+            user=self.user, recipe_id=first
+        ).exists())
+        self.assertEqual(
+            list(Subscription.objects.values_list('subscriber', 'author')),
+            [(self.user.pk, self.author.pk)]
+        )
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).subscribers_count, 1
+        )
+        self.assertEqual(len(self.log), 0)
+
+    def test_crash_before_apply_recovered_by_command(self):
+        self.enqueue_changes()
+        pending = len(self.log)
+        # Процесс падает посреди пачки: транзакция откатывается, журнал
+        # остается.
+        with mock.patch.object(
+            write_behind, '_apply_subscriptions', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.worker.drain()
+        self.assertEqual(len(self.log), pending)
+        self.assertEqual(
+            Favorite.objects.filter(user=self.user).count(), 1
+        )
+        self.assertFalse(Subscription.objects.exists())
+
+        output = StringIO()
+        call_command('apply_write_behind', stdout=output)
+        self.assertIn(f'Применено изменений: {pending}', output.getvalue())
+        self.assert_applied()
+
+    def test_batch_replayed_after_commit_not_counted_twice(self):
+        self.enqueue_changes()
+        # Пачка зафиксирована, но процесс упал до очистки журнала.
+        write_behind.apply_mutations(self.log.fetch(100))
+        call_command('apply_write_behind', stdout=StringIO())
+        self.assert_applied()
+
+    @override_settings(WRITE_BEHIND_ENABLED=True)
+    def test_bulk_endpoint_uses_log(self):
+        first, second, third = [recipe.pk for recipe in self.recipes]
+        Favorite.objects.create(user=self.user, recipe_id=first)
+        response = client_for(self.user).post(
+            '/api/recipes/favorite/bulk/',
+            {'add': [first, second, 999], 'remove': [third]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': first, 'status': EXISTS},
+            {'id': second, 'status': ADDED},
+            {'id': 999, 'status': NOT_FOUND},
+            {'id': third, 'status': ABSENT},
+        ])
+        self.assertEqual(self.log.pending(self.user.pk), [
+            (write_behind.FAVORITES, second, 1)
+        ])
+        self.assertFalse(Favorite.objects.filter(recipe_id=second).exists())
+
+        self.worker.drain()
+        self.assertTrue(Favorite.objects.filter(
+            user=self.user, recipe_id=second
+        ).exists())
+        self.assertEqual(Recipe.objects.get(pk=second).favorites_count, 1)
+
+    @override_settings(WRITE_BEHIND_ENABLED=True)
+    def test_queued_change_invalidates_etag(self):
+        client = client_for(self.user)
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        response = client.get(url)
+        self.assertFalse(response.data['is_favorited'])
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'{url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.log), 1)
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertNotEqual(response['ETag'], etag)
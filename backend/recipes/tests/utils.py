@@ -0,0 +1,64 @@
+"""Общие данные для тестов рецептов."""
+
+from django.core.cache import cache, caches
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def clear_caches():
+    """Версии, множества и ответы хранятся в кэшах между тестами."""
+    cache.clear()
+    caches['responses'].clear()
+
+
+def create_user(index):
+    return User.objects.create_user(
+        email=f'user{index}@example.com',
+        username=f'user{index}',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='Secret-password-1'
+    )
+
+
+def create_recipes(count, authors, tags, ingredients):
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[index % len(authors)],
+            name=f'Рецепт {index}',
+            text='Описание',
+            cooking_time=10,
+            image='recipes/test.png'
+        )
+        recipe.tags.set(tags[:index % len(tags) + 1])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients[:index % len(ingredients) + 1]
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+def create_catalogue():
+    tags = [
+        Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+        for index in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г'
+        )
+        for index in range(5)
+    ]
+    return tags, ingredients
+
+
+def client_for(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -1,44 +1,152 @@
 """Модуль для работы с корзиной покупок."""
 
+import csv
+import os
 from datetime import date
+from io import BytesIO
 
-from django.db.models import Sum
-from django.http import HttpResponse
-from recipes.models import RecipeIngredient
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from recipes.constants import (SHOPPING_LIST_CHUNK_SIZE,
+                               SHOPPING_LIST_FILENAME,
+                               SHOPPING_LIST_PDF_FONT_SIZE,
+                               SHOPPING_LIST_PDF_LINE_HEIGHT)
+from recipes.models import ShoppingListItem
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FALLBACK_FONT_NAME = 'Helvetica'
+PDF_MARGIN = 50
 
-def get_shopping_cart_textfile(user):
+
+def get_shopping_cart_ingredients(user):
     """
-    Формирует текстовый файл списка покупок.
+    Возвращает суммарное количество каждого ингредиента из корзины.
+
+    Суммы берутся из материализованной таблицы ShoppingListItem, строки
+    отдаются по мере чтения курсора, без загрузки всего списка в память.
 
     Args:
         user: Пользователь, для которого формируется список покупок.
 
     Returns:
-        HttpResponse: Ответ с текстовым файлом списка покупок.
+        Iterator[dict]: Строки с названием, единицей измерения и суммой.
     """
-    ingredients = RecipeIngredient.objects.filter(
-        recipe__shopping_carts__user=user
-    ).values(
+    return ShoppingListItem.objects.filter(user=user).values(
         'ingredient__name',
         'ingredient__measurement_unit',
-    ).annotate(
-        total_amount=Sum('amount', distinct=True)
-    ).order_by('ingredient__name')
+        'total_amount',
+    ).order_by('ingredient__name').iterator(
+        chunk_size=SHOPPING_LIST_CHUNK_SIZE
+    )
 
+
+def _get_title():
     current_date = date.today().strftime('%d.%m.%Y')
-    lines = [f'Список покупок на {current_date}:\n']
+    return f'Список покупок на {current_date}:'
+
 
+def _format_item(item):
+    name = item['ingredient__name']
+    amount = item['total_amount']
+    unit = item['ingredient__measurement_unit']
+    return f'{name} - {amount} {unit}'
+
+
+def _render_txt(ingredients):
+    """Построчно формирует текстовый список покупок."""
+    yield f'{_get_title()}\n\n'
     for item in ingredients:
-        name = item['ingredient__name']
-        amount = item['total_amount']
-        unit = item['ingredient__measurement_unit']
-        lines.append(f'{name} - {amount} {unit}')
-
-    response = HttpResponse(
-        content='\n'.join(lines),
-        content_type='text/plain'
-    )
-    response['Content-Disposition'] = 'attachment; filename=ShoppingList.txt'
+        yield f'{_format_item(item)}\n'
+
+
+class _Echo:
+    """Псевдо-файл, возвращающий записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+def _render_csv(ingredients):
+    """Построчно формирует список покупок в формате CSV."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for item in ingredients:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['total_amount'],
+            item['ingredient__measurement_unit'],
+        ))
+
+
+def _get_pdf_font():
+    """Регистрирует шрифт с поддержкой кириллицы, если он доступен."""
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if font_path and os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        return PDF_FONT_NAME
+    return PDF_FALLBACK_FONT_NAME
+
+
+def _render_pdf(ingredients):
+    """
+    Формирует список покупок в формате PDF.
+
+    Строки читаются из курсора постранично, но документ PDF собирается
+    целиком, так как таблица ссылок пишется в конце файла.
+    """
+    buffer = BytesIO()
+    font = _get_pdf_font()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    y = height - PDF_MARGIN
+
+    def write_line(text):
+        nonlocal y
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(font, SHOPPING_LIST_PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, text)
+        y -= SHOPPING_LIST_PDF_LINE_HEIGHT
+
+    write_line(_get_title())
+    y -= SHOPPING_LIST_PDF_LINE_HEIGHT
+    for item in ingredients:
+        write_line(_format_item(item))
+    pdf.save()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', _render_txt),
+    'csv': ('text/csv; charset=utf-8', _render_csv),
+    'pdf': ('application/pdf', _render_pdf),
+}
+
 
+def get_shopping_cart_file(user, file_format='txt'):
+    """
+    Формирует файл списка покупок в потоковом режиме.
+
+    Args:
+        user: Пользователь, для которого формируется список покупок.
+        file_format: Формат файла: txt, csv или pdf.
+
+    Returns:
+        StreamingHttpResponse: Ответ с файлом списка покупок.
+    """
+    content_type, render = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        render(get_shopping_cart_ingredients(user)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename={SHOPPING_LIST_FILENAME}.{file_format}'
+    )
     return response
@@ -1,22 +1,83 @@
-from core.pagination import LimitPageNumberPagination
-from django.http import JsonResponse
+from core.conditional import (INGREDIENTS_VERSION_KEY, RECIPES_VERSION_KEY,
+                              TAGS_VERSION_KEY, conditional,
+                              membership_version_key, recipe_version_key)
+from core.db_router import ReplicaReadMixin
+from core.response_cache import cache_anonymous_response
+from django.conf import settings
+from django.http import Http404, HttpResponsePermanentRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from .autocomplete import search_ingredients
+from .bulk import bulk_change_user_recipes, enqueue_user_recipes_changes
+from .constants import (INGREDIENT_AUTOCOMPLETE_LIMIT,
+                        INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+from .filters import (TAGS_MATCH_ALL, TAGS_MATCH_ANY, IngredientFilter,
+                      RecipeFilter)
+from .membership import enqueue_membership_change, get_membership
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingListItem, Tag)
+from .pagination import RecipePagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
+from .recommendations import (get_popular_recipes, get_recommended_recipes,
+                              get_similar_recipes)
+from .renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer)
+from .serializers import (BulkRecipesSerializer, FavoriteSerializer,
+                          GetRecipeSerializer, IngredientSerializer,
                           RecipeMinifiedSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, TagSerializer)
-from .utils import get_shopping_cart_textfile
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
+                          TagSerializer)
+from .short_links import (click_buffer, get_or_create_short_link,
+                          resolve_short_link)
+from .tag_index import recipe_tag_index
+from .utils import get_shopping_cart_file
+from .write_behind import FAVORITES, SHOPPING_CART
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def get_tags_version_keys(request, *args, **kwargs):
+    return (TAGS_VERSION_KEY,)
+
+
+def get_ingredients_version_keys(request, *args, **kwargs):
+    return (INGREDIENTS_VERSION_KEY,)
+
+
+def get_recipe_version_keys(request, *args, **kwargs):
+    keys = [
+        TAGS_VERSION_KEY,
+        INGREDIENTS_VERSION_KEY,
+        recipe_version_key(kwargs['pk']),
+    ]
+    if request.user.is_authenticated:
+        keys.append(membership_version_key(request.user.pk))
+    return keys
+
+
+def get_recipe_list_version_keys(request, *args, **kwargs):
+    return (TAGS_VERSION_KEY, INGREDIENTS_VERSION_KEY, RECIPES_VERSION_KEY)
+
+
+RECIPE_LIST_CACHE_PARAMS = (
+    'tags', 'tags_match', 'author', 'page', 'limit', 'cursor', 'search'
+)
+# Для анонимного пользователя эти фильтры не меняют выдачу.
+RECIPE_LIST_IGNORED_PARAMS = ('is_favorited', 'is_in_shopping_cart')
+# Лента только с этими параметрами строится по индексу тегов.
+TAG_INDEX_PARAMS = {'tags', 'tags_match', 'page', 'limit'}
+MUTATION_KINDS = {Favorite: FAVORITES, ShoppingCart: SHOPPING_CART}
+
+
+@method_decorator(conditional(get_ingredients_version_keys), name='retrieve')
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -26,16 +87,74 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (permissions.AllowAny,)
     search_fields = ('^name', )
 
+    @method_decorator(conditional(get_ingredients_version_keys))
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return Response(search_ingredients(name))
+
+    @action(detail=False, methods=('get',), url_path='autocomplete')
+    @method_decorator(conditional(get_ingredients_version_keys))
+    def autocomplete(self, request):
+        """Первые N ингредиентов, название которых начинается с name."""
+        try:
+            limit = int(request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            limit = INGREDIENT_AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, INGREDIENT_AUTOCOMPLETE_MAX_LIMIT))
+        return Response(
+            search_ingredients(request.query_params.get('name', ''), limit)
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@method_decorator(conditional(get_recipe_version_keys), name='retrieve')
+@method_decorator(
+    cache_anonymous_response(
+        get_recipe_list_version_keys,
+        query_params=RECIPE_LIST_CACHE_PARAMS,
+        ignored_params=RECIPE_LIST_IGNORED_PARAMS
+    ),
+    name='list'
+)
+@method_decorator(
+    cache_anonymous_response(get_recipe_version_keys),
+    name='retrieve'
+)
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ViewSet для работы с рецептами"""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    # Короткая ссылка создается при первом запросе.
+    primary_actions = ('get_short_link',)
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'recommended'):
+            return Recipe.objects.with_related()
+        return super().get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        tags_match = params.get('tags_match', TAGS_MATCH_ANY)
+        if (not params.getlist('tags')
+                or set(params) - TAG_INDEX_PARAMS
+                or tags_match not in (TAGS_MATCH_ANY, TAGS_MATCH_ALL)):
+            return super().list(request, *args, **kwargs)
+        # Фильтр только по тегам: id всей выборки берутся из индекса
+        # в памяти, из БД читаются только рецепты страницы.
+        page = self.paginate_queryset(recipe_tag_index.filter(
+            params.getlist('tags'), match_all=tags_match == TAGS_MATCH_ALL
+        ))
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True
+        )
+        return self.get_paginated_response(serializer.data)
 
     def _handle_object_creation(self,
                                 request,
@@ -44,6 +163,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                 error_message):
         """Общий метод для создания объектов (избранное/корзина)."""
         recipe = get_object_or_404(Recipe, pk=pk)
+        if settings.WRITE_BEHIND_ENABLED:
+            if not enqueue_membership_change(
+                request, MUTATION_KINDS[serializer_class.Meta.model],
+                recipe.pk, True
+            ):
+                return Response(
+                    {api_settings.NON_FIELD_ERRORS_KEY: [error_message]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                RecipeMinifiedSerializer(recipe).data,
+                status=status.HTTP_201_CREATED
+            )
         serializer = serializer_class(
             data={'user': request.user.id, 'recipe': recipe.id},
             context={'request': request}
@@ -58,10 +190,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def _handle_object_deletion(self, request, pk, model_class, error_message):
         """Общий метод для удаления объектов (избранное/корзина)."""
         recipe = get_object_or_404(Recipe, pk=pk)
-        deleted_count, _ = model_class.objects.filter(
-            user=request.user,
-            recipe=recipe
-        ).delete()
+        if settings.WRITE_BEHIND_ENABLED:
+            deleted_count = enqueue_membership_change(
+                request, MUTATION_KINDS[model_class], recipe.pk, False
+            )
+        else:
+            deleted_count, _ = model_class.objects.filter(
+                user=request.user,
+                recipe=recipe
+            ).delete()
 
         if deleted_count == 0:
             return Response(
@@ -70,6 +207,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _handle_bulk(self, request, model_class, counter_field=None):
+        """Общий метод для массовых операций (избранное/корзина)."""
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if settings.WRITE_BEHIND_ENABLED:
+            results = enqueue_user_recipes_changes(
+                request,
+                MUTATION_KINDS[model_class],
+                **serializer.validated_data
+            )
+        else:
+            results = bulk_change_user_recipes(
+                request.user,
+                model_class,
+                counter_field=counter_field,
+                **serializer.validated_data
+            )
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='favorite')
     def add_favorite(self, request, pk):
         """Добавление рецепта в избранное."""
@@ -90,6 +246,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
             "Рецепта нет в избранном"
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def bulk_favorite(self, request):
+        """Добавление и удаление нескольких рецептов в избранном."""
+        return self._handle_bulk(request, Favorite, 'favorites_count')
+
     @action(detail=True, methods=['post'], url_path='shopping_cart')
     def add_shopping_cart(self, request, pk):
         """Добавление рецепта в список покупок."""
@@ -110,15 +276,80 @@ class RecipeViewSet(viewsets.ModelViewSet):
             "Рецепта нет в списке покупок"
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def bulk_shopping_cart(self, request):
+        """Добавление и удаление нескольких рецептов в списке покупок."""
+        return self._handle_bulk(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='shopping_list',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_list(self, request):
+        """Список покупок с суммарным количеством ингредиентов."""
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(
+            ShoppingListItemSerializer(items, many=True).data
+        )
+
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                          ShoppingListPDFRenderer)
     )
     def download_shopping_cart(self, request):
-        """Загрузка списка покупок."""
-        return get_shopping_cart_textfile(request.user)
+        """Загрузка списка покупок в формате txt, csv или pdf."""
+        return get_shopping_cart_file(
+            request.user,
+            request.accepted_renderer.format
+        )
+
+    @action(
+        detail=True,
+        methods=('get',),
+        url_path='similar',
+        permission_classes=(permissions.AllowAny,)
+    )
+    def similar(self, request, pk):
+        """Похожие рецепты, посчитанные командой build_recommendations."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        return Response(RecipeMinifiedSerializer(
+            get_similar_recipes(Recipe.objects.all(), recipe),
+            many=True,
+            context={'request': request}
+        ).data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='recommended',
+        permission_classes=(permissions.AllowAny,)
+    )
+    def recommended(self, request):
+        """Рекомендации по избранному и списку покупок пользователя."""
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(get_recommended_recipes(
+            queryset, get_membership({'request': request})
+        ))
+        # У отмеченных рецептов может не оказаться соседей: тогда, как
+        # и без отметок, выдаются популярные рецепты.
+        if not page:
+            page = self.paginate_queryset(get_popular_recipes(queryset))
+        return self.get_paginated_response(GetRecipeSerializer(
+            page, many=True, context=self.get_serializer_context()
+        ).data)
 
     @action(
         detail=True,
@@ -127,22 +358,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='get-link',
         permission_classes=(permissions.AllowAny,)
     )
-    def get_short_link(self, request, *args, **kwargs):
-        recipe_id = kwargs.get('pk')
-        relative_link = f'/s/{recipe_id}/'
-        short_link = request.build_absolute_uri(relative_link)
-
-        return JsonResponse({'short_link': short_link})
+    def get_short_link(self, request, pk):
+        """Короткая ссылка на рецепт."""
+        link = get_or_create_short_link(get_object_or_404(Recipe, pk=pk))
+        short_link = request.build_absolute_uri(
+            reverse('short-link', args=(link.code,))
+        )
+        return JsonResponse({'short-link': short_link})
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(conditional(get_tags_version_keys), name='list')
+@method_decorator(conditional(get_tags_version_keys), name='retrieve')
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all().order_by('name')
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
 
 
-def short_link_view(request, *args, **kwargs):
-    path = request.build_absolute_uri()
-    path = path.replace('/s/', '/recipes/')
-    return redirect(path)
+def short_link_view(request, code):
+    """
+    Переход по короткой ссылке. Код разрешается через LRU процесса,
+    переход учитывается в буфере, а ответ разрешено кэшировать клиентам
+    и прокси: код ссылки не меняется.
+    """
+    link = resolve_short_link(code)
+    if link is None:
+        raise Http404('Ссылка не найдена')
+    link_id, recipe_id = link
+    click_buffer.add(link_id)
+    response = HttpResponsePermanentRedirect(
+        request.build_absolute_uri(f'/recipes/{recipe_id}/')
+    )
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_MAX_AGE
+    )
+    return response
+
+
+def legacy_short_link_view(request, pk):
+    """Старые ссылки вида /s/<id рецепта>/."""
+    return redirect(request.build_absolute_uri(f'/recipes/{pk}/'))
@@ -0,0 +1,357 @@
+"""
+Отложенная запись избранного, корзины и подписок.
+
+В режиме WRITE_BEHIND_ENABLED запрос только дописывает изменение в
+локальный журнал SQLite и сразу отвечает. Фоновый поток читает журнал
+пачками, схлопывает повторные изменения одной связи и применяет пачку
+к основной БД одной транзакцией. Строки журнала удаляются только после
+фиксации, поэтому после падения процесса журнал дочитывается заново:
+применение идемпотентно, повтор пачки ничего не меняет. Пока изменение
+в журнале, оно накладывается на множества recipes.membership, и
+пользователь сразу видит свои действия.
+"""
+
+import atexit
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+from core.conditional import bump_versions, membership_version_key
+from core.counters import change_counter
+from core.queries import delete_returning, insert_ignore_conflicts
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from users.models import Subscription
+
+from .models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from .shopping_list import schedule_shopping_list_refresh
+
+logger = logging.getLogger('foodgram.write_behind')
+
+User = get_user_model()
+
+FAVORITES, SHOPPING_CART, SUBSCRIPTIONS = range(3)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS mutation ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'kind INTEGER NOT NULL, '
+    'user_id INTEGER NOT NULL, '
+    'object_id INTEGER NOT NULL, '
+    'added INTEGER NOT NULL, '
+    'created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS mutation_user_idx ON mutation (user_id, id)',
+)
+
+
+class MutationLog:
+    """
+    Журнал изменений в файле SQLite, общий для процессов одного хоста.
+
+    Запись подтверждается только после fsync, поэтому принятое
+    изменение переживает падение процесса.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connect(self):
+        db = getattr(self._local, 'connection', None)
+        # После fork соединение родителя использовать нельзя.
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=FULL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.connection, self._local.pid = db, os.getpid()
+        return db
+
+    def append(self, kind, user_id, changes):
+        """Дописывает изменения (object_id, added) одной транзакцией."""
+        db = self._connect()
+        created = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT INTO mutation '
+                '(kind, user_id, object_id, added, created) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(kind, user_id, object_id, int(added), created)
+                 for object_id, added in changes]
+            )
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def pending(self, user_id):
+        """Непримененные изменения пользователя в порядке записи."""
+        return self._connect().execute(
+            'SELECT kind, object_id, added FROM mutation '
+            'WHERE user_id = ? ORDER BY id', (user_id,)
+        ).fetchall()
+
+    def fetch(self, limit):
+        """Первые limit изменений: (id, kind, user_id, object_id, added)."""
+        return self._connect().execute(
+            'SELECT id, kind, user_id, object_id, added FROM mutation '
+            'ORDER BY id LIMIT ?', (limit,)
+        ).fetchall()
+
+    def discard(self, last_id):
+        """Удаляет примененные изменения до last_id включительно."""
+        self._connect().execute(
+            'DELETE FROM mutation WHERE id <= ?', (last_id,)
+        )
+
+    def oldest(self):
+        """Время записи самого старого непримененного изменения."""
+        return self._connect().execute(
+            'SELECT MIN(created) FROM mutation'
+        ).fetchone()[0]
+
+    def __len__(self):
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM mutation'
+        ).fetchone()[0]
+
+
+def coalesce(rows):
+    """
+    Схлопывает изменения пачки: для каждой связи остается последнее.
+    Возвращает {вид: {(user_id, object_id): added}}.
+    """
+    changes = defaultdict(dict)
+    for _, kind, user_id, object_id, added in rows:
+        changes[kind][user_id, object_id] = bool(added)
+    return changes
+
+
+def _apply_user_recipes(model, changes, counter_field=None):
+    """
+    Применяет изменения избранного или корзины. Возвращает пары
+    (user_id, recipe_id), которые INSERT и DELETE действительно
+    изменили: повтор уже примененной пачки ничего не возвращает.
+    """
+    user_ids = {user_id for user_id, _ in changes}
+    recipe_ids = {recipe_id for _, recipe_id in changes}
+    # Пользователь или рецепт могли быть удалены, пока изменение ждало.
+    found_users = set(User.objects.filter(
+        pk__in=user_ids
+    ).values_list('pk', flat=True))
+    found_recipes = set(Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list('pk', flat=True))
+    added = insert_ignore_conflicts(
+        model,
+        [model(user_id=user_id, recipe_id=recipe_id)
+         for (user_id, recipe_id), is_added in changes.items()
+         if is_added and user_id in found_users
+         and recipe_id in found_recipes],
+        returning=('user', 'recipe')
+    )
+    by_user = defaultdict(list)
+    for (user_id, recipe_id), is_added in changes.items():
+        if not is_added:
+            by_user[user_id].append(recipe_id)
+    removed = []
+    if by_user:
+        condition = Q()
+        for user_id, user_recipe_ids in by_user.items():
+            condition |= Q(user_id=user_id, recipe_id__in=user_recipe_ids)
+        removed = delete_returning(
+            model.objects.filter(condition), returning=('user', 'recipe')
+        )
+    if counter_field:
+        _change_counters(Recipe, counter_field, added, removed)
+    return added, removed
+
+
+def _apply_subscriptions(changes):
+    """Применяет изменения подписок, как _apply_user_recipes."""
+    found_users = set(User.objects.filter(
+        pk__in={user_id for pair in changes for user_id in pair}
+    ).values_list('pk', flat=True))
+    added = insert_ignore_conflicts(
+        Subscription,
+        [Subscription(subscriber_id=subscriber_id, author_id=author_id)
+         for (subscriber_id, author_id), is_added in changes.items()
+         if is_added and subscriber_id != author_id
+         and subscriber_id in found_users and author_id in found_users],
+        returning=('subscriber', 'author')
+    )
+    removed = []
+    condition = Q()
+    for (subscriber_id, author_id), is_added in changes.items():
+        if not is_added:
+            condition |= Q(subscriber_id=subscriber_id, author_id=author_id)
+    if condition:
+        removed = delete_returning(
+            Subscription.objects.filter(condition),
+            returning=('subscriber', 'author')
+        )
+    _change_counters(User, 'subscribers_count', added, removed)
+    return added, removed
+
+
+def _change_counters(model, field, added, removed):
+    """Меняет счетчики объектов одним запросом на каждое значение."""
+    deltas = Counter(object_id for _, object_id in added)
+    deltas.subtract(object_id for _, object_id in removed)
+    by_delta = defaultdict(list)
+    for object_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(object_id)
+    for delta, object_ids in by_delta.items():
+        change_counter(model.objects.filter(pk__in=object_ids), field, delta)
+
+
+def apply_mutations(rows):
+    """
+    Применяет пачку изменений журнала одной транзакцией.
+
+    Массовые операции не отправляют сигналы, поэтому счетчики, версии
+    пользователей и списки покупок обновляются здесь, как в recipes.bulk.
+    """
+    changes = coalesce(rows)
+    changed_users = set()
+    with transaction.atomic():
+        if changes[FAVORITES]:
+            added, removed = _apply_user_recipes(
+                Favorite, changes[FAVORITES], 'favorites_count'
+            )
+            changed_users.update(user_id for user_id, _ in added + removed)
+        if changes[SHOPPING_CART]:
+            added, removed = _apply_user_recipes(
+                ShoppingCart, changes[SHOPPING_CART]
+            )
+            changed = added + removed
+            changed_users.update(user_id for user_id, _ in changed)
+            if changed:
+                schedule_shopping_list_refresh(
+                    {user_id for user_id, _ in changed},
+                    RecipeIngredient.objects.filter(
+                        recipe_id__in={recipe_id for _, recipe_id in changed}
+                    ).values_list('ingredient_id', flat=True).distinct()
+                )
+        if changes[SUBSCRIPTIONS]:
+            added, removed = _apply_subscriptions(changes[SUBSCRIPTIONS])
+            changed_users.update(user_id for user_id, _ in added + removed)
+        if changed_users:
+            bump_versions(*map(membership_version_key, changed_users))
+
+
+class WriteBehindWorker:
+    """
+    Фоновый поток, применяющий журнал раз в interval секунд или при
+    накоплении batch_size изменений.
+
+    Журнал читает один процесс хоста: его держит flock на файле рядом
+    с журналом. Блокировку снимает ядро при падении процесса, и
+    журнал подхватывает следующий процесс.
+    """
+
+    def __init__(self, log, interval, batch_size):
+        self.log = log
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._added = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='write-behind', daemon=True
+                )
+                self._thread.start()
+
+    def notify(self, count=1):
+        """Учитывает новые изменения и будит поток при полной пачке."""
+        self.start()
+        with self._lock:
+            self._added += count
+            full = self._added >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def drain(self):
+        """Применяет весь журнал и возвращает число изменений."""
+        with open(f'{self.log.path}.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            applied = 0
+            while True:
+                with self._lock:
+                    self._added = 0
+                rows = self.log.fetch(self.batch_size)
+                if not rows:
+                    return applied
+                apply_mutations(rows)
+                self.log.discard(rows[-1][0])
+                applied += len(rows)
+
+    def _run(self):
+        while True:
+            try:
+                self.drain()
+            except Exception:
+                logger.exception('Не удалось применить журнал изменений')
+            finally:
+                connection.close()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+mutation_log = MutationLog(settings.WRITE_BEHIND_LOG_PATH)
+write_behind_worker = WriteBehindWorker(
+    mutation_log,
+    settings.WRITE_BEHIND_FLUSH_INTERVAL,
+    settings.WRITE_BEHIND_BATCH_SIZE
+)
+
+
+def enqueue_mutations(kind, user_id, changes):
+    """
+    Записывает изменения (object_id, added) в журнал; в БД они попадут
+    позже.
+    """
+    changes = list(changes)
+    if changes:
+        mutation_log.append(kind, user_id, changes)
+        write_behind_worker.notify(len(changes))
+
+
+def get_pending_mutations(user_id):
+    """
+    Изменения пользователя, еще не примененные к БД. Заодно запускает
+    поток: журнал, оставшийся после падения, применится и без новых
+    изменений.
+    """
+    if not settings.WRITE_BEHIND_ENABLED:
+        return ()
+    write_behind_worker.start()
+    return mutation_log.pending(user_id)
+
+
+def _drain_at_exit():
+    if settings.WRITE_BEHIND_ENABLED:
+        try:
+            write_behind_worker.drain()
+        except Exception:
+            logger.exception('Не удалось применить журнал изменений')
+
+
+atexit.register(_drain_at_exit)
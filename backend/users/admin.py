@@ -1,3 +1,4 @@
+from core.images import get_image_url
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
@@ -18,6 +19,8 @@ class UsersAdmin(BaseUserAdmin):
         'first_name',
         'last_name',
         'is_staff',
+        'recipes_count',
+        'subscribers_count',
         'avatar_preview',
     )
     list_filter = ('is_staff', 'is_superuser', 'is_active')
@@ -30,7 +33,12 @@ class UsersAdmin(BaseUserAdmin):
                               'is_superuser', 'groups', 'user_permissions')}),
         ('Даты', {'fields': ('last_login', 'date_joined')}),
     )
-    readonly_fields = ('last_login', 'date_joined')
+    readonly_fields = (
+        'last_login',
+        'date_joined',
+        'recipes_count',
+        'subscribers_count',
+    )
 
     @admin.display(description="Аватар")  # Используем декоратор для описания
     def avatar_preview(self, obj):
@@ -38,7 +46,7 @@ class UsersAdmin(BaseUserAdmin):
         if obj.avatar:
             return format_html(
                 '<img src="{}" width="50" height="50" />',
-                obj.avatar.url
+                get_image_url(obj, 'avatar', 'thumb')
             )
         return "Нет аватара"
 
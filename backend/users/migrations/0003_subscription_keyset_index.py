@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscriber', '-created', '-id'], name='subscription_keyset_idx'),
+        ),
+    ]
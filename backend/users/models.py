@@ -40,6 +40,22 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Варианты аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -74,6 +90,12 @@ class Subscription(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['subscriber', '-created', '-id'],
+                name='subscription_keyset_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'subscriber'],
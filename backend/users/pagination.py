@@ -0,0 +1,5 @@
+from core.pagination import OptionalKeysetPagination
+
+
+class SubscriptionPagination(OptionalKeysetPagination):
+    keyset_ordering = ('-subscribed_at', '-subscription_id')
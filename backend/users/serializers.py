@@ -1,17 +1,17 @@
+from core.fields import ImageVariantField, StrippedBase64ImageField
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from recipes.membership import get_membership
 from recipes.models import Recipe
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
 
-from .models import Subscription
-
 User = get_user_model()
 
 
 class UsersSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    avatar = ImageVariantField('thumb')
 
     class Meta:
         model = User
@@ -26,20 +26,17 @@ class UsersSerializer(UserSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        return (
-            request
-            and request.user.is_authenticated
-            and Subscription.objects.filter(
-                subscriber=request.user,
-                author=obj
-            ).exists()
-        )
+        if request is None or request.user.pk == obj.pk:
+            return False
+        return obj.pk in get_membership(self.context).subscriptions
 
 
 class AvatarSerializer(serializers.ModelSerializer):
 
-    avatar = Base64ImageField(
+    avatar = StrippedBase64ImageField(
         max_length=None,
         allow_empty_file=True,
         allow_null=True,
@@ -59,14 +56,25 @@ class AvatarSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image = ImageVariantField('thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None, если оно не задано."""
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return limit if limit >= 0 else None
+
+
 class GetSubscriptionSerializer(UsersSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='recipes.count')
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -83,15 +91,15 @@ class GetSubscriptionSerializer(UsersSerializer):
         )
 
     def get_recipes(self, obj):
-        try:
-            count = int(
-                self.context['request'].query_params.get('recipes_limit'))
-        except (TypeError, ValueError, KeyError):
-            count = None
-
-        recipes = obj.recipes.all()
+        # Лента подписок заранее загружает рецепты всех авторов страницы.
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()[:get_recipes_limit(
+                self.context.get('request')
+            )]
         return RecipeMinifiedSerializer(
-            recipes[:count],
+            recipes,
             many=True,
             context=self.context
         ).data
@@ -0,0 +1,66 @@
+from core.authentication import invalidate_tokens
+from core.conditional import bump_versions, membership_version_key
+from core.counters import change_counter
+from core.images import schedule_image_processing
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Recipe
+from recipes.signals import bump_recipe_versions
+from rest_framework.authtoken.models import Token
+
+from .models import Subscription, User
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_subscription_version(sender, instance, **kwargs):
+    bump_versions(membership_version_key(instance.subscriber_id))
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'subscribers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'subscribers_count', -1
+    )
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+def refresh_avatar_dependents(user_id):
+    """Аватар входит в представление рецептов автора и в request.user."""
+    bump_recipe_versions(
+        Recipe.objects.filter(author_id=user_id).values_list('pk', flat=True)
+    )
+    invalidate_user_tokens(user_id)
+
+
+@receiver(post_save, sender=User)
+def process_avatar(sender, instance, **kwargs):
+    schedule_image_processing(
+        instance, 'avatar', on_done=refresh_avatar_dependents
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, created, update_fields,
+                           **kwargs):
+    """Пароль, is_active и профиль меняются сохранением пользователя."""
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens((instance.key,))
@@ -1,20 +1,79 @@
+from core.db_router import ReplicaReadMixin
 from core.pagination import LimitPageNumberPagination
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import F, Value, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes.membership import enqueue_membership_change
+from recipes.models import Recipe
 from recipes.permissions import IsAuthorOrReadOnly
+from recipes.write_behind import SUBSCRIPTIONS
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .models import Subscription
+from .pagination import SubscriptionPagination
 from .serializers import (AvatarSerializer, GetSubscriptionSerializer,
-                          UsersSerializer)
+                          UsersSerializer, get_recipes_limit)
 
 User = get_user_model()
 
+LATEST_RECIPES_SQL = (
+    'SELECT * FROM ({}) AS ranked {} '
+    'ORDER BY ranked.author_id, ranked.row_number'
+)
+
+
+def attach_latest_recipes(authors, limit=None):
+    """
+    Загружает одним запросом первые limit рецептов каждого автора
+    и сохраняет их в атрибуте latest_recipes.
+
+    Номер рецепта внутри автора считает оконная функция ROW_NUMBER()
+    по (author_id, -created_at), поэтому число запросов не зависит
+    ни от количества авторов, ни от limit.
+    """
+    if not authors:
+        return
+    ranked = Recipe.objects.filter(
+        author_id__in=[author.pk for author in authors]
+    ).annotate(row_number=Window(
+        RowNumber(),
+        partition_by=F('author_id'),
+        order_by=(F('created_at').desc(), F('id').desc()),
+    )).values('id', 'author_id', 'name', 'image', 'image_variants',
+              'cooking_time', 'row_number')
+    # Django 3.2 не умеет фильтровать по оконной функции, поэтому
+    # ограничение накладывается во внешнем запросе.
+    sql, params = ranked.query.sql_with_params()
+    where = ''
+    if limit is not None:
+        where = 'WHERE ranked.row_number <= %s'
+        params = (*params, limit)
+    by_author = {author.pk: [] for author in authors}
+    for recipe in Recipe.objects.raw(
+        LATEST_RECIPES_SQL.format(sql, where), params
+    ):
+        by_author[recipe.author_id].append(recipe)
+    for author in authors:
+        author.latest_recipes = by_author[author.pk]
+
+
+def get_subscriptions(user):
+    """Авторы, на которых подписан пользователь, с датой подписки."""
+    return User.objects.filter(
+        subscribed_by__subscriber=user
+    ).annotate(
+        subscribed_at=F('subscribed_by__created'),
+        subscription_id=F('subscribed_by__id'),
+        is_subscribed=Value(True),
+    )
+
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(ReplicaReadMixin, DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UsersSerializer
     permission_classes = (IsAuthorOrReadOnly,)
@@ -50,8 +109,8 @@ class UserViewSet(DjoserUserViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            user.avatar.delete()
-            user.save()
+            user.avatar.delete(save=False)
+            user.save(update_fields=('avatar',))
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         serializer = AvatarSerializer(
@@ -81,10 +140,15 @@ class UserViewSet(DjoserUserViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            _, created = Subscription.objects.get_or_create(
-                subscriber=request.user,
-                author=author
-            )
+            if settings.WRITE_BEHIND_ENABLED:
+                created = enqueue_membership_change(
+                    request, SUBSCRIPTIONS, author.pk, True
+                )
+            else:
+                _, created = Subscription.objects.get_or_create(
+                    subscriber=request.user,
+                    author=author
+                )
             if not created:
                 return Response(
                     {'errors': 'Вы уже подписаны на этого пользователя'},
@@ -97,10 +161,15 @@ class UserViewSet(DjoserUserViewSet):
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        deleted_count, _ = Subscription.objects.filter(
-            subscriber=request.user,
-            author=author
-        ).delete()
+        if settings.WRITE_BEHIND_ENABLED:
+            deleted_count = enqueue_membership_change(
+                request, SUBSCRIPTIONS, author.pk, False
+            )
+        else:
+            deleted_count, _ = Subscription.objects.filter(
+                subscriber=request.user,
+                author=author
+            ).delete()
 
         if deleted_count == 0:
             return Response(
@@ -116,11 +185,10 @@ class UserViewSet(DjoserUserViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(
-            subscribed_by__subscriber=request.user
-        )
-        paginator = self.pagination_class()
+        subscriptions = get_subscriptions(request.user)
+        paginator = SubscriptionPagination()
         page = paginator.paginate_queryset(subscriptions, request)
+        attach_latest_recipes(page, get_recipes_limit(request))
 
         serializer = GetSubscriptionSerializer(
             page,